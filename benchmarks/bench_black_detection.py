@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: exhaustive vs. sampled, parallel and luma-proxy black frame detection.
+Generates a synthetic video with known black segments, then compares the
+speed and accuracy of detect_black_frames at several sample steps and
+worker counts, and with the batched LumaAnalyzer. A second video adds dark
+scenes and grainy black frames to compare detection quality.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_dark_scenes, make_segments, write_test_video
+from core.luma_analysis import LumaAnalyzer
+from core.video_processor import ProcessingStats, detect_black_frames
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=1800)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--steps", type=int, nargs="+", default=[5, 15, 30])
+    parser.add_argument("--workers", type=int, nargs="*", default=[2, 4])
+    parser.add_argument("--grain", type=int, default=26, help="noise level of black frames in the hard video")
+    args = parser.parse_args()
+
+    segments = make_segments(args.frames, args.fps)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.mp4")
+        write_test_video(path, args.width, args.height, args.frames, args.fps, segments)
+
+        reference, full_time = timed(detect_black_frames, path)
+        shortest = min(end - start + 1 for start, end in segments)
+        print(f"{args.width}x{args.height}, {args.frames} frames, "
+              f"{len(reference)} black segments, shortest {shortest} frames")
+        print("exact results are only guaranteed while step <= shortest segment")
+        print(f"{'mode':<12}{'time (s)':>10}{'fps':>10}{'speedup':>10}  exact")
+        print(f"{'full':<12}{full_time:>10.2f}{args.frames / full_time:>10.0f}"
+              f"{1.0:>10.2f}  {reference == segments}")
+        for step in args.steps:
+            for seek in (False, True):
+                result, t = timed(detect_black_frames, path, sample_step=step, seek=seek)
+                mode = f"{'seek' if seek else 'step'}={step}"
+                print(f"{mode:<12}{t:>10.2f}{args.frames / t:>10.0f}"
+                      f"{full_time / t:>10.2f}  {result == reference}")
+        for workers in args.workers:
+            result, t = timed(detect_black_frames, path, workers=workers)
+            mode = f"workers={workers}"
+            print(f"{mode:<12}{t:>10.2f}{args.frames / t:>10.0f}"
+                  f"{full_time / t:>10.2f}  {result == reference}")
+        result, t = timed(detect_black_frames, path, analyzer=LumaAnalyzer())
+        print(f"{'luma':<12}{t:>10.2f}{args.frames / t:>10.0f}"
+              f"{full_time / t:>10.2f}  {result == reference}")
+
+        # Analysis cost alone (everything but decoding), per frame
+        print(f"{'analysis':<12}{'us/frame':>10}")
+        for name, analyzer in (("full", None), ("luma", LumaAnalyzer())):
+            stats = ProcessingStats()
+            detect_black_frames(path, stats=stats, analyzer=analyzer)
+            stages = stats.snapshot()["stages"]
+            seconds = sum(s["seconds"] for stage, s in stages.items() if stage != "decode")
+            print(f"{name:<12}{seconds / args.frames * 1e6:>10.0f}")
+
+        hard_path = os.path.join(tmp, "hard.mp4")
+        dark = make_dark_scenes(args.frames, args.fps, segments)
+        write_test_video(hard_path, args.width, args.height, args.frames, args.fps, segments,
+                         dark_scenes=dark, grain=args.grain)
+        print(f"hard video: {len(dark)} dark scenes, black frames with grain up to {args.grain}")
+        print(f"{'mode':<12}{'found':>10}{'false +':>10}{'missed':>10}  exact")
+        for name, analyzer in (("full", None), ("luma", LumaAnalyzer())):
+            result = detect_black_frames(hard_path, analyzer=analyzer)
+            false_pos = len([seg for seg in result if seg not in segments])
+            missed = len([seg for seg in segments if seg not in result])
+            print(f"{name:<12}{len(result):>10}{false_pos:>10}{missed:>10}  {result == segments}")
+
+
+if __name__ == "__main__":
+    main()
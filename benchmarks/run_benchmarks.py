@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Automatic Meme Filler.
+Generates a synthetic video, then times detect_black_frames (full-frame mean
+and LumaAnalyzer), insert_memes (OpenCV and ffmpeg encoders), get_random_memes
+and MemeSampler, each in a fresh process so peak RSS is per stage.
+Results are written as JSON and can be compared against a stored baseline
+to catch regressions. Runs offline; only needs OpenCV and NumPy (the
+ffmpeg encoder stage is recorded as skipped when ffmpeg isn't installed).
+
+Usage:
+    python3 benchmarks/run_benchmarks.py --output results.json
+    python3 benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python3 benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import PATTERNS, make_segments, write_test_video
+from core import ffmpeg_tools
+
+STAGES = ("detect_black_frames", "detect_luma", "insert_memes", "insert_memes_ffmpeg",
+          "get_random_memes", "meme_sampler")
+# Stages that need the ffmpeg and ffprobe binaries
+FFMPEG_STAGES = ("insert_memes_ffmpeg",)
+
+
+def _has_ffmpeg() -> bool:
+    try:
+        ffmpeg_tools.find_binary("ffmpeg")
+        ffmpeg_tools.find_binary("ffprobe")
+        return True
+    except ffmpeg_tools.FFmpegError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_stage(stage: str, video_path: str, frames: int, segments, repeat: int) -> dict:
+    """Run one stage `repeat` times in this (fresh) process; keep the best time."""
+    from core.encoders import FFmpegEncoder
+    from core.luma_analysis import LumaAnalyzer
+    from core.video_processor import detect_black_frames, insert_memes
+    from utils.meme_loader import get_random_memes, load_meme_library
+    from utils.meme_sampler import MemeSampler
+
+    library = load_meme_library(os.path.join(ROOT, "memes"))
+    memes = [path for paths in library.values() for path in paths]
+    best = None
+    result = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if stage == "detect_black_frames":
+            found = detect_black_frames(video_path)
+            result["exact"] = found == segments
+        elif stage == "detect_luma":
+            found = detect_black_frames(video_path, analyzer=LumaAnalyzer())
+            result["exact"] = found == segments
+        elif stage in ("insert_memes", "insert_memes_ffmpeg"):
+            encoder = FFmpegEncoder() if stage == "insert_memes_ffmpeg" else None
+            with tempfile.TemporaryDirectory() as tmp:
+                out_path = os.path.join(tmp, "out.mp4")
+                insert_memes(video_path, out_path, segments, memes, encoder=encoder)
+                result["output_mb"] = round(os.path.getsize(out_path) / (1024 * 1024), 2)
+        elif stage == "get_random_memes":
+            calls = 10000
+            for _ in range(calls):
+                get_random_memes(library, set(library), max(1, len(segments)))
+        else:
+            calls = 10000
+            sampler = MemeSampler(library, seed=0)
+            for _ in range(calls):
+                sampler.sample(set(library), max(1, len(segments)))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    result["wall_s"] = round(best, 4)
+    if stage in ("get_random_memes", "meme_sampler"):
+        result["ops_per_s"] = round(calls / best, 1)
+    else:
+        result["fps"] = round(frames / best, 1)
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def run_suite(args) -> dict:
+    frames = int(args.seconds * args.fps)
+    segments = make_segments(frames, args.fps, args.pattern)
+    report = {
+        "config": {
+            "width": args.width, "height": args.height, "fps": args.fps,
+            "frames": frames, "pattern": args.pattern, "segments": len(segments),
+            "repeat": args.repeat,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "stages": {},
+    }
+    ctx = multiprocessing.get_context("spawn")
+    has_ffmpeg = _has_ffmpeg()
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "synthetic.mp4")
+        write_test_video(video_path, args.width, args.height, frames, args.fps, segments)
+        for stage in args.stages:
+            if stage in FFMPEG_STAGES and not has_ffmpeg:
+                report["stages"][stage] = {"skipped": "ffmpeg not found"}
+            else:
+                with ctx.Pool(1) as pool:
+                    report["stages"][stage] = pool.apply(
+                        _run_stage, (stage, video_path, frames, segments, args.repeat)
+                    )
+            print(f"{stage:<22}{json.dumps(report['stages'][stage])}")
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Return human-readable regressions of `report` against `baseline`."""
+    if report["config"] != baseline.get("config"):
+        print("warning: benchmark config differs from the baseline's")
+    regressions = []
+    for stage, now in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before or "skipped" in now or "skipped" in before:
+            continue
+        for metric in ("wall_s", "peak_rss_mb"):
+            if metric in before and now[metric] > before[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{stage}.{metric}: {now[metric]} vs baseline {before[metric]} "
+                    f"(+{(now[metric] / before[metric] - 1) * 100:.0f}%)"
+                )
+        if before.get("exact") and not now.get("exact", True):
+            regressions.append(f"{stage}: result no longer matches the synthetic ground truth")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Automatic Meme Filler benchmark suite")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--pattern", choices=sorted(PATTERNS), default="regular")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; best time is kept")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--save-baseline", help="write the results JSON as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed slowdown/growth vs. baseline (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
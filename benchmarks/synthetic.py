@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Synthetic test videos for the benchmarks.
+Writes deterministic noise videos with NumPy and cv2.VideoWriter, with black
+segments laid out according to a named pattern, so results are reproducible
+on any machine without downloading footage. Optional hard cases: dark (but
+not black) scenes and black frames with film grain.
+"""
+
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+# name -> (segment lengths in seconds, cycled; gap between segments in seconds)
+PATTERNS = {
+    "regular": ([0.5, 1.0, 3.0, 2.0], 4.0),   # a few gaps of mixed length
+    "dense": ([0.2, 0.4], 0.5),               # many short gaps
+    "sparse": ([5.0], 30.0),                  # rare long gaps
+    "none": ([], 0.0),                        # no black frames at all
+}
+
+
+def make_segments(frames: int, fps: int, pattern: str = "regular") -> List[Tuple[int, int]]:
+    """Lay out black segments over `frames` frames according to a pattern."""
+    lengths, gap = PATTERNS[pattern]
+    if not lengths:
+        return []
+    lengths = [max(1, int(round(length * fps))) for length in lengths]
+    gap = max(1, int(round(gap * fps)))
+    segments = []
+    idx = fps * 2
+    i = 0
+    while idx + lengths[i % len(lengths)] < frames:
+        length = lengths[i % len(lengths)]
+        segments.append((idx, idx + length - 1))
+        idx += length + gap
+        i += 1
+    return segments
+
+
+def make_dark_scenes(frames: int, fps: int, segments: List[Tuple[int, int]],
+                     length: float = 1.0) -> List[Tuple[int, int]]:
+    """Place a dark scene of `length` seconds in the middle of every gap between black segments."""
+    length = max(1, int(round(length * fps)))
+    bounds = [-1] + [idx for seg in sorted(segments) for idx in seg] + [frames]
+    scenes = []
+    for gap_start, gap_end in zip(bounds[0::2], bounds[1::2]):
+        gap_start, gap_end = gap_start + 1, gap_end - 1
+        if gap_end - gap_start + 1 >= length + 2:
+            start = (gap_start + gap_end - length + 1) // 2
+            scenes.append((start, start + length - 1))
+    return scenes
+
+
+def _frame_in(segments: List[Tuple[int, int]], idx: int) -> bool:
+    i = np.searchsorted([end for _, end in segments], idx)
+    return i < len(segments) and segments[i][0] <= idx
+
+
+def write_test_video(path: str, width: int, height: int, frames: int, fps: int,
+                     segments: List[Tuple[int, int]], seed: int = 0,
+                     dark_scenes: List[Tuple[int, int]] = (), grain: int = 0) -> None:
+    """
+    Write a noisy test video whose frames are black inside `segments`.
+
+    Frames inside `dark_scenes` show a night shot: a black frame with a dim
+    lit area over ~12% of the picture, whose mean level is below the black
+    threshold although it clearly isn't black. With `grain` > 0, black
+    frames get random noise up to that level (mean about grain / 2).
+    """
+    rng = np.random.default_rng(seed)
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    out = cv2.VideoWriter(path, fourcc, fps, (width, height))
+    if not out.isOpened():
+        raise RuntimeError(f"Could not create {path}")
+    black = np.zeros((height, width, 3), dtype=np.uint8)
+    base = rng.integers(40, 220, size=(height, width, 3), dtype=np.uint8)
+    dark = black.copy()
+    dark[:, :max(1, width * 12 // 100)] = 70
+    segments = sorted(segments)
+    dark_scenes = sorted(dark_scenes)
+    for idx in range(frames):
+        if _frame_in(segments, idx):
+            if grain:
+                out.write(rng.integers(0, grain + 1, size=black.shape, dtype=np.uint8))
+            else:
+                out.write(black)
+        elif _frame_in(dark_scenes, idx):
+            out.write(np.roll(dark, idx * 4, axis=1))
+        else:
+            out.write(np.roll(base, idx * 4, axis=1))
+    out.release()
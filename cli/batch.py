@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Batch mode for Automatic Meme Filler.
+Detects black frames and fills them with memes for a whole directory (or a
+manifest listing one video per line) without the GUI. Videos are processed
+in parallel across a process pool. Every finished job is appended to a
+JSONL journal, so rerunning the same command after an interruption skips
+the videos that are already done.
+
+Usage:
+    python3 cli/batch.py videos/ --output-dir out/ --workers 4
+    python3 cli/batch.py videos.txt --output-dir out/ --categories funny gaming --seed 7
+    python3 cli/batch.py long_video.mp4 --output-dir out/ --shards 8
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.detection_cache import DetectionCache
+from core.encoders import FFmpegEncoder, OpenCVEncoder, default_encoder
+from core.luma_analysis import LumaAnalyzer
+from core.ffmpeg_tools import FFmpegError
+from core.meme_cache import PreparedMemeCache
+from core.meme_disk_cache import MemeDiskCache
+from core.sharded_render import sharded_insert_memes
+from core.smart_render import smart_insert_memes
+from core.video_processor import BLACK_THRESHOLD, ProcessingStats, detect_black_frames, insert_memes
+from utils.meme_loader import load_meme_library
+from utils.meme_sampler import MemeSampler
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+JOURNAL_NAME = "batch_journal.jsonl"
+
+# Per-worker-process state, set up once by _init_worker.
+_worker: Dict = {}
+
+
+# ----------------- Job list -----------------
+def collect_videos(inputs: List[str]) -> List[str]:
+    """Expand directories and manifest files into a list of video paths."""
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(item, name))
+        elif item.lower().endswith(VIDEO_EXTENSIONS):
+            videos.append(item)
+        else:
+            base = os.path.dirname(item)
+            with open(item, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        videos.append(os.path.join(base, line))
+    return [os.path.abspath(v) for v in videos]
+
+
+def plan_outputs(videos: List[str], output_dir: str) -> List[Tuple[str, str]]:
+    """
+    Pair each video with an absolute output path, disambiguating repeated
+    names. Absolute, so the journal stays valid from any working directory.
+    """
+    output_dir = os.path.abspath(output_dir)
+    jobs = []
+    used = set()
+    for video in dict.fromkeys(videos):  # drop duplicates, keep order
+        stem = os.path.splitext(os.path.basename(video))[0]
+        name = f"{stem}_memes.mp4"
+        n = 1
+        while name in used:
+            n += 1
+            name = f"{stem}_{n}_memes.mp4"
+        used.add(name)
+        jobs.append((video, os.path.join(output_dir, name)))
+    return jobs
+
+
+# ----------------- Journal -----------------
+def read_journal(path: str) -> Dict[str, Dict]:
+    """Return the latest journal record per video."""
+    records = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                records[record["video"]] = record
+    except OSError:
+        pass
+    return records
+
+
+def append_journal(path: str, record: Dict):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# ----------------- Worker -----------------
+def _init_worker(library: Dict[str, List[str]], options: Dict):
+    logging.basicConfig(level=options["log_level"],
+                        format=f"[worker {os.getpid()}] %(levelname)s %(message)s")
+    _worker["library"] = library
+    _worker["options"] = options
+    _worker["detection_cache"] = DetectionCache() if options["cache"] else None
+    disk_cache = MemeDiskCache() if options["cache"] else None
+    _worker["meme_cache"] = PreparedMemeCache(disk_cache=disk_cache)
+    _worker["encoder"] = make_encoder(options)
+
+
+def make_encoder(options: Dict):
+    """Encoder backend for the --encoder/--codec/--preset/--crf options."""
+    if options["encoder"] == "opencv":
+        return OpenCVEncoder()
+    if options["encoder"] == "auto" and isinstance(default_encoder(), OpenCVEncoder):
+        logging.warning("ffmpeg not found; encoding with OpenCV (mp4v, no audio)")
+        return OpenCVEncoder()
+    return FFmpegEncoder(codec=options["codec"], preset=options["preset"], crf=options["crf"],
+                         threads=options["encoder_threads"])
+
+
+def run_job(video_path: str, output_path: str) -> Dict:
+    """Detect, pick memes and render one video. Returns its journal record."""
+    options = _worker["options"]
+    stats = ProcessingStats()
+    record = {"video": video_path, "output": output_path, "status": "failed"}
+    start = time.perf_counter()
+    try:
+        cache = _worker["detection_cache"]
+        threshold = options["threshold"]
+        if options["analyzer"] == "luma":
+            analyzer = LumaAnalyzer() if threshold is None else LumaAnalyzer(threshold=threshold)
+            settings = {"analyzer": analyzer}
+        else:
+            settings = {"threshold": BLACK_THRESHOLD if threshold is None else threshold}
+        segments = cache.get(video_path, **settings) if cache else None
+        record["detection_cached"] = segments is not None
+        if segments is None:
+            segments = detect_black_frames(video_path, stats=stats, **settings)
+            if cache:
+                cache.put(video_path, segments, **settings)
+        record["segments"] = len(segments)
+        record["detect_s"] = round(time.perf_counter() - start, 3)
+
+        # Seeded per video, so the memes don't depend on scheduling order.
+        seed = None
+        if options["seed"] is not None:
+            seed = zlib.crc32(f"{options['seed']}:{os.path.basename(video_path)}".encode())
+        sampler = MemeSampler(_worker["library"], seed=seed)
+        memes = sampler.sample(options["categories"], len(segments))
+        if segments and not memes:
+            raise RuntimeError("No memes available for the selected categories.")
+
+        # Render to a temporary name so a killed job never looks finished.
+        partial_path = output_path[:-len(".mp4")] + ".partial.mp4"
+        render_args = dict(zoom_factor=options["zoom"], fade_ms=options["fade_ms"],
+                           meme_cache=_worker["meme_cache"], stats=stats)
+        record["smart_render"] = False
+        if options["smart"]:
+            try:
+                smart_insert_memes(video_path, partial_path, segments, memes, **render_args)
+                record["smart_render"] = True
+            except FFmpegError as e:
+                logging.warning("%s: smart render unavailable (%s); re-encoding", video_path, e)
+                stats.reset()
+        if not record["smart_render"] and options["shards"] > 1:
+            shards = sharded_insert_memes(video_path, partial_path, segments, memes,
+                                          encoder=_worker["encoder"], workers=options["shards"],
+                                          **render_args)
+            record["shards"] = len(shards)
+        elif not record["smart_render"]:
+            insert_memes(video_path, partial_path, segments, memes,
+                         encoder=_worker["encoder"], **render_args)
+        os.replace(partial_path, output_path)
+        record["render_s"] = round(time.perf_counter() - start - record["detect_s"], 3)
+        record["status"] = "done"
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    record["stats"] = stats.snapshot()
+    return record
+
+
+# ----------------- Driver -----------------
+def run_batch(jobs: List[Tuple[str, str]], library: Dict[str, List[str]], options: Dict,
+              journal_path: str, workers: int) -> List[Dict]:
+    """Run jobs on a process pool, journaling each result as it arrives."""
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(library, options)) as pool:
+        pending = {pool.submit(run_job, video, output): video for video, output in jobs}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    video = pending.pop(future)
+                    try:
+                        record = future.result()
+                    except Exception as e:  # worker died (e.g. out of memory)
+                        record = {"video": video, "status": "failed",
+                                  "error": f"{type(e).__name__}: {e}"}
+                    append_journal(journal_path, record)
+                    results.append(record)
+                    _print_record(record, len(results), len(jobs))
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print(f"\nInterrupted; {len(results)} job(s) journaled. "
+                  f"Rerun the same command to resume.")
+            raise
+    return results
+
+
+def _print_record(record: Dict, n: int, total: int):
+    name = os.path.basename(record["video"])
+    if record["status"] == "done":
+        stages = record["stats"]["stages"]
+        top = ", ".join([f"{stage} {info['seconds']:.1f}s"
+                         for stage, info in stages.items() if "." not in stage][:3])
+        print(f"[{n}/{total}] {name}: {record['segments']} segment(s) in {record['seconds']:.1f}s "
+              f"(detect {record['detect_s']:.1f}s, render {record['render_s']:.1f}s; {top})")
+    else:
+        print(f"[{n}/{total}] {name}: FAILED {record.get('error')}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Automatic Meme Filler batch mode")
+    parser.add_argument("inputs", nargs="+",
+                        help="video files, directories of videos, or manifests (one path per line)")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--memes", default="memes", help="meme library folder")
+    parser.add_argument("--categories", nargs="+", help="meme categories to use (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threshold", type=float,
+                        help=f"mean gray level below which a frame is black "
+                             f"(default: {BLACK_THRESHOLD}, or the luma analyzer's own)")
+    parser.add_argument("--analyzer", choices=("luma", "mean"), default="luma",
+                        help="black frame test: batched luma proxy (default) or full-frame mean")
+    parser.add_argument("--zoom", type=int, default=2)
+    parser.add_argument("--fade-ms", type=int, default=500)
+    parser.add_argument("--seed", type=int, help="seed meme selection for reproducible renders")
+    parser.add_argument("--encoder", choices=("auto", "ffmpeg", "opencv"), default="auto",
+                        help="ffmpeg keeps the audio and encodes multithreaded; "
+                             "auto falls back to opencv without ffmpeg")
+    parser.add_argument("--codec", default="libx264", help="ffmpeg video codec")
+    parser.add_argument("--preset", default="veryfast", help="ffmpeg encoder preset")
+    parser.add_argument("--crf", type=int, default=23, help="ffmpeg constant quality (lower is better)")
+    parser.add_argument("--encoder-threads", type=int,
+                        help="threads per ffmpeg encoder (default: cores / (workers * shards))")
+    parser.add_argument("--smart", action="store_true",
+                        help="re-encode only around memes (needs ffmpeg/ffprobe)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="render each video with this many processes, split between "
+                             "black segments (needs ffmpeg); best with few videos")
+    parser.add_argument("--journal", help=f"job journal (default: OUTPUT_DIR/{JOURNAL_NAME})")
+    parser.add_argument("--retry-failed", action="store_true", help="rerun jobs that failed before")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't use the detection and meme frame caches")
+    parser.add_argument("--summary", help="write all job records of this run to a JSON file")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    logging.basicConfig(level=log_level, format="%(levelname)s %(message)s")
+    os.makedirs(args.output_dir, exist_ok=True)
+    journal_path = args.journal or os.path.join(args.output_dir, JOURNAL_NAME)
+
+    jobs = plan_outputs(collect_videos(args.inputs), args.output_dir)
+    journal = read_journal(journal_path)
+    todo = []
+    for video, output in jobs:
+        previous = journal.get(video)
+        if (previous and previous["status"] == "done" and previous.get("output") == output
+                and os.path.exists(output)):
+            continue
+        if previous and previous["status"] == "failed" and not args.retry_failed:
+            continue
+        todo.append((video, output))
+    skipped = len(jobs) - len(todo)
+    print(f"{len(jobs)} video(s): {skipped} already journaled, {len(todo)} to process "
+          f"with {min(args.workers, max(1, len(todo)))} worker(s)")
+    if not todo:
+        return
+
+    library = load_meme_library(args.memes)
+    options = {
+        "categories": sorted(args.categories or library),
+        "threshold": args.threshold,
+        "analyzer": args.analyzer,
+        "zoom": args.zoom,
+        "fade_ms": args.fade_ms,
+        "seed": args.seed,
+        "smart": args.smart,
+        "shards": max(1, args.shards),
+        "encoder": args.encoder,
+        "codec": args.codec,
+        "preset": args.preset,
+        "crf": args.crf,
+        # Share the cores between the workers' encoders instead of oversubscribing
+        "encoder_threads": (args.encoder_threads if args.encoder_threads is not None
+                            else max(1, (os.cpu_count() or 1)
+                                     // (max(1, args.workers) * max(1, args.shards)))),
+        "cache": not args.no_cache,
+        "log_level": log_level,
+    }
+    start = time.perf_counter()
+    try:
+        results = run_batch(todo, library, options, journal_path, max(1, args.workers))
+    except KeyboardInterrupt:
+        sys.exit(130)
+    wall = time.perf_counter() - start
+
+    done = [r for r in results if r["status"] == "done"]
+    busy = sum(r.get("seconds", 0) for r in results)
+    print(f"Finished {len(done)}/{len(results)} job(s) in {wall:.1f}s "
+          f"({busy:.1f}s of job time, {busy / wall if wall else 0:.1f}x parallel)")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump({"wall_s": round(wall, 3), "jobs": results}, f, indent=2)
+    if len(done) < len(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
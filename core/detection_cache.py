@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Detection Cache for Automatic Meme Filler App.
+Persists black frame detection results on disk so that re-running detection
+on an unchanged video returns instantly.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from core.video_processor import detect_black_frames
+from utils.cache_paths import user_cache_dir
+
+# detect_black_frames' defaults, so omitted and explicit defaults share a key.
+_DEFAULT_SETTINGS = {
+    name: param.default
+    for name, param in inspect.signature(detect_black_frames).parameters.items()
+    if param.default is not inspect.Parameter.empty
+}
+_FINGERPRINT_BLOCK = 64 * 1024
+
+
+def default_cache_dir() -> str:
+    """Return the per-user cache directory for detection results."""
+    return user_cache_dir("detections")
+
+
+def video_fingerprint(video_path: str) -> str:
+    """
+    Hash the size plus the first, middle and last 64 KiB of a file.
+
+    Cheap even for multi-gigabyte videos, and catches files rewritten in place
+    with their mtime preserved.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(video_path, "rb") as f:
+        for offset in (0, size // 2, max(0, size - _FINGERPRINT_BLOCK)):
+            f.seek(offset)
+            digest.update(f.read(_FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """
+    Disk cache of detect_black_frames results.
+
+    Entries are keyed by the video's absolute path, size, mtime and content
+    fingerprint plus the detection settings. Each entry is a small JSON file;
+    once the directory grows past `max_bytes` the least recently used entries
+    are evicted.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 32 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # ----------------- Keys -----------------
+    @staticmethod
+    def _path_hash(video_path: str) -> str:
+        return hashlib.sha1(os.path.abspath(video_path).encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _plain(settings: Dict) -> Dict:
+        """Settings as JSON values; a LumaAnalyzer is keyed by its parameters."""
+        return {k: v.settings() if hasattr(v, "settings") else v
+                for k, v in settings.items() if k != "stats"}
+
+    @classmethod
+    def _relevant(cls, settings: Dict) -> Dict:
+        """
+        The settings that can change the result, defaults filled in.
+
+        The full-frame test classifies every frame on its own, so the
+        parallel split (workers, chunk_frames) doesn't matter to it. An
+        analyzer's hysteresis and minimum length restart at every chunk, so
+        with one they do, unless the scan is serial. A parallel scan
+        classifies every frame whatever sample_step says, so it is keyed
+        as a full scan.
+        """
+        settings = {**_DEFAULT_SETTINGS, **settings}
+        if settings["workers"] > 1:
+            settings["sample_step"] = 1
+        neutral = {"seek"}
+        if settings["analyzer"] is None:
+            neutral |= {"workers", "chunk_frames"}
+        else:
+            neutral.add("threshold")  # the analyzer has its own
+            if settings["workers"] <= 1:
+                neutral |= {"workers", "chunk_frames"}
+        return {k: v for k, v in cls._plain(settings).items() if k not in neutral}
+
+    def _entry_path(self, video_path: str, settings: Dict) -> str:
+        stat = os.stat(video_path)
+        relevant = self._relevant(settings)
+        identity = json.dumps([
+            os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns,
+            video_fingerprint(video_path), sorted(relevant.items())
+        ])
+        key = hashlib.sha1(identity.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{self._path_hash(video_path)}-{key}.json")
+
+    # ----------------- Lookup -----------------
+    def get(self, video_path: str, **settings) -> Optional[List[Tuple[int, int]]]:
+        """Return cached segments for the video and settings, or None."""
+        entry = self._entry_path(video_path, settings)
+        try:
+            with open(entry, "r") as f:
+                data = json.load(f)
+            os.utime(entry)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return [tuple(seg) for seg in data["segments"]]
+
+    def put(self, video_path: str, segments: List[Tuple[int, int]], **settings) -> None:
+        """Store segments for the video and settings, then enforce the size limit."""
+        entry = self._entry_path(video_path, settings)
+        tmp_path = f"{entry}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "video": os.path.abspath(video_path),
+                "settings": self._plain(settings),
+                "segments": [list(seg) for seg in segments],
+            }, f)
+        os.replace(tmp_path, entry)  # atomic, so readers never see half a file
+        self._evict()
+
+    def detect(self, video_path: str, **settings) -> List[Tuple[int, int]]:
+        """Cached drop-in for detect_black_frames(video_path, **settings)."""
+        segments = self.get(video_path, **settings)
+        if segments is None:
+            segments = detect_black_frames(video_path, **settings)
+            self.put(video_path, segments, **settings)
+        return segments
+
+    # ----------------- Invalidation -----------------
+    def invalidate(self, video_path: str) -> int:
+        """Drop every cached result for a video. Returns the number removed."""
+        prefix = self._path_hash(video_path) + "-"
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until under max_bytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if e.is_file() and e.name.endswith(".json"):
+                    stat = e.stat()
+                    entries.append((stat.st_mtime, stat.st_size, e.path))
+                    total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Encoders for Automatic Meme Filler App.
+Pluggable video encoder backends for insert_memes. FFmpegEncoder pipes raw
+frames into a local ffmpeg process, so the codec runs multithreaded in its
+own process with tunable preset and quality, and muxes the source audio
+back in. OpenCVEncoder keeps the original cv2.VideoWriter path (mp4v,
+video only) as the fallback when ffmpeg isn't installed.
+"""
+
+import os
+from fractions import Fraction
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from core import ffmpeg_tools
+
+# Audio codecs each container can take as-is; anything else is re-encoded
+# to the container's fallback codec. Other containers always copy.
+_AUDIO_COPY = {
+    ".mp4": {"aac", "mp3", "alac", "ac3", "eac3", "opus", "flac"},
+    ".m4v": {"aac", "mp3", "alac", "ac3", "eac3"},
+    ".mov": {"aac", "mp3", "alac", "ac3", "eac3", "pcm_s16le", "pcm_s24le"},
+    ".webm": {"opus", "vorbis"},
+}
+_AUDIO_FALLBACK = {".webm": "libopus"}
+
+
+class OpenCVEncoder:
+    """cv2.VideoWriter backend: single-threaded, fixed quality, no audio."""
+
+    name = "opencv"
+
+    def __init__(self, fourcc: str = "mp4v"):
+        self.fourcc = fourcc
+
+    def settings(self) -> Dict:
+        return {"encoder": self.name, "fourcc": self.fourcc}
+
+    def open(self, output_path: str, size: Tuple[int, int], frame_rate: float,
+             source_path: Optional[str] = None) -> cv2.VideoWriter:
+        """Start writing `output_path`; source_path is ignored (no audio)."""
+        # Whole frame rates only, as insert_memes has always written them
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                 int(frame_rate), size)
+        if not writer.isOpened():
+            raise RuntimeError(f"Could not create {output_path}")
+        return writer
+
+
+class FFmpegEncoder:
+    """
+    ffmpeg backend fed BGR frames over stdin.
+
+    Args:
+        codec: ffmpeg video encoder, e.g. "libx264", "libx265", "libvpx-vp9".
+        preset: Speed/size trade-off passed as -preset (None to omit).
+        crf: Constant quality level passed as -crf (None to omit).
+        threads: Encoder threads; 0 lets ffmpeg use every core.
+        pix_fmt: Output pixel format.
+        audio: Copy the first audio stream of the source into the output.
+            It is stream-copied when the container accepts its codec and
+            re-encoded otherwise.
+        extra_args: More output options, placed before the output path.
+    """
+
+    name = "ffmpeg"
+
+    def __init__(
+        self,
+        codec: str = "libx264",
+        preset: Optional[str] = "veryfast",
+        crf: Optional[int] = 23,
+        threads: int = 0,
+        pix_fmt: str = "yuv420p",
+        audio: bool = True,
+        extra_args: Optional[List[str]] = None
+    ):
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        self.threads = threads
+        self.pix_fmt = pix_fmt
+        self.audio = audio
+        self.extra_args = list(extra_args or [])
+
+    def settings(self) -> Dict:
+        return {"encoder": self.name, **self.__dict__}
+
+    def codec_args(self) -> List[str]:
+        args = ["-c:v", self.codec, "-pix_fmt", self.pix_fmt]
+        if self.preset is not None:
+            args += ["-preset", self.preset]
+        if self.crf is not None:
+            args += ["-crf", str(self.crf)]
+        return args + ["-threads", str(self.threads)] + self.extra_args
+
+    def audio_args(self, source_path: str, output_path: str) -> Tuple[List[str], List[str]]:
+        """(input args, output args) that mux the source's audio, if it has any."""
+        codec = ffmpeg_tools.probe_audio(source_path)
+        if codec is None:
+            return [], []
+        ext = os.path.splitext(output_path)[1].lower()
+        allowed = _AUDIO_COPY.get(ext)
+        audio_codec = "copy" if allowed is None or codec in allowed else _AUDIO_FALLBACK.get(ext, "aac")
+        return (["-i", source_path],
+                ["-map", "0:v:0", "-map", "1:a:0", "-c:a", audio_codec])
+
+    def mux_audio(self, video_path: str, source_path: str, output_path: str) -> bool:
+        """
+        Write video_path's video plus source_path's audio (if any) to
+        output_path, without re-encoding the video. Returns False, writing
+        nothing, if the source has no audio.
+        """
+        input_args, output_args = self.audio_args(source_path, output_path)
+        if not input_args:
+            return False
+        ffmpeg_tools.run([
+            ffmpeg_tools.find_binary("ffmpeg"), "-y", "-v", "error", "-i", video_path
+        ] + input_args + output_args + ["-c:v", "copy", output_path])
+        return True
+
+    def open(self, output_path: str, size: Tuple[int, int], frame_rate: float,
+             source_path: Optional[str] = None) -> ffmpeg_tools.FFmpegFrameWriter:
+        """
+        Start an ffmpeg process writing `output_path`. Raises FFmpegError if
+        ffmpeg is missing.
+        """
+        input_args, output_args = [], []
+        if self.audio and source_path is not None:
+            input_args, output_args = self.audio_args(source_path, output_path)
+        if self.pix_fmt.startswith(("yuv420", "nv12")) and (size[0] % 2 or size[1] % 2):
+            # Chroma subsampling needs even dimensions; pad by one pixel
+            output_args += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        # e.g. 29.97 -> 30000/1001, so timestamps don't drift
+        rate = Fraction(frame_rate).limit_denominator(1001)
+        return ffmpeg_tools.FFmpegFrameWriter(output_path, size, rate, self.codec_args(),
+                                              output_args, input_args)
+
+
+def default_encoder():
+    """FFmpegEncoder with default settings if ffmpeg is installed, else OpenCVEncoder."""
+    try:
+        ffmpeg_tools.find_binary("ffmpeg")
+        ffmpeg_tools.find_binary("ffprobe")
+    except ffmpeg_tools.FFmpegError:
+        return OpenCVEncoder()
+    return FFmpegEncoder()
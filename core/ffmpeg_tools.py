@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+FFmpeg helpers for Automatic Meme Filler App.
+Thin wrappers around the local ffmpeg/ffprobe binaries: probing, piping raw
+frames into an encoder, stream-copy cuts and lossless concatenation.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+from fractions import Fraction
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class FFmpegError(RuntimeError):
+    """Raised when ffmpeg or ffprobe is missing or exits with an error."""
+
+
+def find_binary(name: str = "ffmpeg") -> str:
+    """Return the path of an ffmpeg binary, or raise FFmpegError."""
+    path = shutil.which(name)
+    if path is None:
+        raise FFmpegError(f"{name} not found on PATH; install FFmpeg to use this feature.")
+    return path
+
+
+def run(args: List[str]) -> str:
+    """Run an ffmpeg/ffprobe command line and return its stdout."""
+    result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        message = result.stderr.decode(errors="replace").strip().splitlines()
+        raise FFmpegError(f"{os.path.basename(args[0])} failed: {message[-1] if message else result.returncode}")
+    return result.stdout.decode(errors="replace")
+
+
+def probe_video(video_path: str) -> Dict:
+    """
+    Describe the first video stream of a file.
+
+    Returns:
+        Dict with codec, width, height, pix_fmt, frame_rate (Fraction) and
+        bit_rate (int, 0 if unknown).
+    """
+    out = run([
+        find_binary("ffprobe"), "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,width,height,pix_fmt,r_frame_rate,bit_rate",
+        "-of", "json", video_path
+    ])
+    streams = json.loads(out).get("streams")
+    if not streams:
+        raise FFmpegError(f"No video stream in {video_path}")
+    stream = streams[0]
+    return {
+        "codec": stream["codec_name"],
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "pix_fmt": stream.get("pix_fmt", "yuv420p"),
+        "frame_rate": Fraction(stream["r_frame_rate"]),
+        "bit_rate": int(stream.get("bit_rate") or 0),
+    }
+
+
+def probe_audio(video_path: str) -> Optional[str]:
+    """Codec name of the first audio stream of a file, or None if it has none."""
+    out = run([
+        find_binary("ffprobe"), "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name", "-of", "csv=p=0", video_path
+    ])
+    return out.strip() or None
+
+
+def probe_frames(video_path: str) -> Tuple[List[float], List[int]]:
+    """
+    List the presentation time of every video frame and which are keyframes.
+
+    Reads packet headers only (no decoding), so it is fast even for long
+    videos.
+
+    Returns:
+        (frame_times, keyframes): frame_times[i] is the pts in seconds of
+        frame i in display order; keyframes are frame indices.
+    """
+    out = run([
+        find_binary("ffprobe"), "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path
+    ])
+    packets = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if pts and pts != "N/A":
+            packets.append((float(pts), "K" in flags))
+    packets.sort()
+    frame_times = [pts for pts, _ in packets]
+    keyframes = [i for i, (_, key) in enumerate(packets) if key]
+    return frame_times, keyframes
+
+
+class FFmpegFrameWriter:
+    """
+    Encode BGR frames by piping them to an ffmpeg process as raw video.
+
+    Has the same write()/release() interface as cv2.VideoWriter. The piped
+    frames are input 0; `input_args` can add more inputs (e.g. a file to
+    take the audio from) for `codec_args` to map.
+    """
+
+    def __init__(self, output_path: str, size: Tuple[int, int], frame_rate,
+                 codec_args: Optional[List[str]] = None, output_args: Optional[List[str]] = None,
+                 input_args: Optional[List[str]] = None):
+        width, height = size
+        self.size = size
+        args = [
+            find_binary("ffmpeg"), "-y", "-v", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}",
+            "-r", str(frame_rate), "-i", "-",
+        ]
+        args += input_args or []
+        args += codec_args or ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+        args += output_args or []
+        args.append(output_path)
+        self._proc = subprocess.Popen(args, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame: np.ndarray):
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            self.release()  # raises with ffmpeg's error message
+
+    def release(self):
+        if self._proc.stdin and not self._proc.stdin.closed:
+            try:
+                self._proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        stderr = self._proc.stderr.read().decode(errors="replace")
+        if self._proc.wait() != 0:
+            lines = stderr.strip().splitlines()
+            raise FFmpegError(f"ffmpeg encoder failed: {lines[-1] if lines else self._proc.returncode}")
+
+
+def copy_range(video_path: str, output_path: str, start_time: float, frames: int,
+               output_args: Optional[List[str]] = None) -> None:
+    """
+    Stream-copy `frames` video frames starting at `start_time` (seconds).
+
+    start_time must be the pts of a keyframe, so the cut is exact without
+    re-encoding.
+    """
+    run([
+        find_binary("ffmpeg"), "-y", "-v", "error",
+        "-ss", f"{start_time:.6f}", "-i", video_path,
+        "-map", "0:v:0", "-frames:v", str(frames), "-c", "copy",
+    ] + (output_args or []) + [output_path])
+
+
+def concat(parts: List[str], output_path: str, output_args: Optional[List[str]] = None) -> None:
+    """Losslessly join files with identical stream layout (concat demuxer)."""
+    list_path = output_path + ".concat.txt"
+    with open(list_path, "w") as f:
+        for part in parts:
+            escaped = os.path.abspath(part).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        run([
+            find_binary("ffmpeg"), "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy",
+        ] + (output_args or []) + [output_path])
+    finally:
+        os.remove(list_path)
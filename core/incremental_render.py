@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Incremental Rendering for Automatic Meme Filler App.
+Remembers what each output was rendered from (one entry per black segment:
+boundaries, meme, zoom and fade) and, when the same output is rendered
+again, re-encodes only the frames whose segments changed. Everything else
+is stream-copied from the previous output and spliced in with ffmpeg.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from core import ffmpeg_tools
+from core.encoders import FFmpegEncoder, OpenCVEncoder
+from core.instrumentation import ProcessingStats
+from core.meme_cache import PreparedMemeCache
+from core.smart_render import (mux_spliced_audio, plan_smart_render, smart_insert_memes,
+                                 splice_render)
+from core.video_processor import MemeCompositor, insert_memes
+from utils.cache_paths import user_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Encoder settings recorded for outputs written by smart_insert_memes, which
+# re-encodes in the source's own codec instead of with an encoder backend.
+SMART_RENDER_SETTINGS = {"encoder": "smart"}
+
+
+def default_cache_dir() -> str:
+    """Return the per-user directory for render states."""
+    return user_cache_dir("renders")
+
+
+def _file_id(path: str) -> list:
+    """Absolute path, size and mtime of a file (size and mtime None if missing)."""
+    try:
+        stat = os.stat(path)
+        return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        return [os.path.abspath(path), None, None]
+
+
+class RenderState:
+    """
+    Everything an output's frames depend on.
+
+    Frames outside every segment are the source's own, so two renders of
+    the same source differ only inside segments whose entry changed:
+    (start, end, meme file, zoom, fade length in frames).
+    """
+
+    def __init__(self, source: list, size: List[int], fps: int, frame_count: int,
+                 encoder: Dict, segments: List[list]):
+        self.source = source
+        self.size = list(size)
+        self.fps = fps
+        self.frame_count = frame_count
+        self.encoder = encoder
+        self.segments = segments
+
+    @classmethod
+    def build(cls, video_path: str, black_segments: List[Tuple[int, int]], memes: List[str],
+              size: Tuple[int, int], fps: int, frame_count: int, zoom_factor: int,
+              fade_ms: int, encoder_settings: Dict) -> "RenderState":
+        """
+        State of a render, assigning memes to segments like MemeCompositor
+        does: by position. Callers that want edits to leave the other
+        segments' entries alone pass one meme per segment, chosen per
+        segment (see MemeFillerApp.memes_for).
+        """
+        fade_frames = int((fade_ms / 1000.0) * fps)
+        order = sorted(range(len(black_segments)), key=lambda i: black_segments[i][0])
+        segments = []
+        for i in order:
+            start, end = black_segments[i]
+            meme = _file_id(memes[i % len(memes)]) if memes else None
+            segments.append([int(start), int(end), meme, zoom_factor, fade_frames])
+        # Round-trip through JSON so fresh and loaded states compare equal
+        return cls.from_dict(json.loads(json.dumps(cls(
+            _file_id(video_path), size, fps, frame_count, encoder_settings, segments
+        ).to_dict())))
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RenderState":
+        return cls(data["source"], data["size"], data["fps"], data["frame_count"],
+                   data["encoder"], data["segments"])
+
+    def compatible(self, other: "RenderState") -> bool:
+        """True if other renders the same source in the same format and encoder."""
+        return (self.source == other.source and self.size == other.size and self.fps == other.fps
+                and self.frame_count == other.frame_count and self.encoder == other.encoder)
+
+    def changed_ranges(self, other: "RenderState") -> List[Tuple[int, int]]:
+        """
+        Frame ranges (inclusive) that look different in other: every segment
+        present in only one of the two states, merged where they overlap.
+        """
+        mine = {json.dumps(entry) for entry in self.segments}
+        theirs = {json.dumps(entry) for entry in other.segments}
+        changed = sorted(tuple(json.loads(entry)[:2]) for entry in mine ^ theirs)
+        merged: List[Tuple[int, int]] = []
+        for start, end in changed:
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+
+class RenderStateStore:
+    """
+    Render states on disk, one small JSON file per output path.
+
+    A state also records the output file's size and mtime, so it is ignored
+    once the output has been replaced or edited by anything else.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, output_path: str) -> str:
+        key = hashlib.sha1(os.path.abspath(output_path).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, output_path: str) -> Optional[RenderState]:
+        """State the output was rendered from, or None if unknown or stale."""
+        try:
+            with open(self._entry_path(output_path), "r") as f:
+                data = json.load(f)
+            if data["output"] != _file_id(output_path):
+                return None
+            return RenderState.from_dict(data["state"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, output_path: str, state: RenderState) -> None:
+        entry = self._entry_path(output_path)
+        tmp_path = f"{entry}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"output": _file_id(output_path), "state": state.to_dict()}, f)
+        os.replace(tmp_path, entry)
+
+    def forget(self, output_path: str) -> None:
+        try:
+            os.remove(self._entry_path(output_path))
+        except OSError:
+            pass
+
+
+def _rerender(
+    cap: cv2.VideoCapture,
+    video_path: str,
+    output_path: str,
+    changed: List[Tuple[int, int]],
+    compositor: MemeCompositor,
+    state: RenderState,
+    encoder,
+    stats: Optional[ProcessingStats],
+    progress,
+    should_stop
+) -> Optional[int]:
+    """
+    Re-encode the keyframe-aligned windows around `changed` and splice them
+    into the previous output. Returns the number of frames re-encoded, or
+    None if the previous output can't be reused.
+
+    With an OpenCVEncoder, or encoder None (smart renders), the windows are
+    encoded in the previous output's codec, pixel format and bitrate.
+    """
+    frame_times, keyframes = ffmpeg_tools.probe_frames(output_path)
+    if len(frame_times) != state.frame_count:
+        return None
+    plan = plan_smart_render(changed, keyframes, len(frame_times))
+    info = ffmpeg_tools.probe_video(output_path)
+    if isinstance(encoder, FFmpegEncoder):
+        codec_args = encoder.codec_args()
+    else:
+        codec_args = ["-c:v", info["codec"], "-pix_fmt", info["pix_fmt"]]
+        if info["bit_rate"]:
+            codec_args += ["-b:v", str(info["bit_rate"])]
+    has_audio = ffmpeg_tools.probe_audio(output_path) is not None
+    muxer = encoder if isinstance(encoder, FFmpegEncoder) else None
+
+    base, ext = os.path.splitext(output_path)
+    spliced_path = f"{base}.rerender{ext}"
+    try:
+        splice_render(cap, output_path, spliced_path, plan, frame_times, compositor,
+                      tuple(state.size), info["frame_rate"], codec_args, stats, progress, should_stop)
+        mux_spliced_audio(spliced_path, video_path, output_path, muxer, audio=has_audio)
+    finally:
+        if os.path.exists(spliced_path):
+            os.remove(spliced_path)
+    return sum(end - first for first, end, re_encode in plan if re_encode)
+
+
+def incremental_insert_memes(
+    video_path: str,
+    output_path: str,
+    black_segments: List[Tuple[int, int]],
+    memes: List[str],
+    zoom_factor: int = 2,
+    fade_ms: int = 500,
+    meme_cache: Optional[PreparedMemeCache] = None,
+    stats: Optional[ProcessingStats] = None,
+    encoder=None,
+    store: Optional[RenderStateStore] = None,
+    progress=None,
+    should_stop=None,
+    smart: bool = False
+) -> Dict:
+    """
+    insert_memes that reuses the previous render of output_path.
+
+    If output_path was last written by this function from the same source,
+    size, frame rate and encoder settings, only the segments whose entry
+    changed are re-encoded (widened to the previous output's keyframes) and
+    the rest is stream-copied from it. Otherwise, or if ffmpeg is missing,
+    the whole video is rendered with insert_memes, or with smart_insert_memes
+    if `smart` (which raises FFmpegError without ffmpeg). A previous output
+    written in the other of those two modes is still reused, keeping its
+    mode. Arguments are as for insert_memes; `store` keeps the render
+    states (default cache dir).
+
+    Returns:
+        {"mode": "unchanged" | "incremental" | "full", "frames": total
+        frames, "frames_rendered": frames composited and encoded}.
+    """
+    store = store if store is not None else RenderStateStore()
+    encoder = encoder if encoder is not None else OpenCVEncoder()
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("Could not open input video.")
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def build(smart_mode: bool) -> RenderState:
+        return RenderState.build(video_path, black_segments, memes, size, fps, total, zoom_factor,
+                                 fade_ms, SMART_RENDER_SETTINGS if smart_mode else encoder.settings())
+
+    state = build(smart)
+    try:
+        previous = store.load(output_path)
+        if previous is not None and not previous.compatible(state):
+            other = build(not smart)
+            if previous.compatible(other):
+                smart, state = not smart, other
+        if previous is not None and previous.compatible(state):
+            changed = previous.changed_ranges(state)
+            if not changed:
+                if progress is not None:
+                    progress(total, total)
+                return {"mode": "unchanged", "frames": total, "frames_rendered": 0}
+            compositor = MemeCompositor(black_segments, memes, size, fps,
+                                        zoom_factor, fade_ms, meme_cache, stats)
+            try:
+                rendered = _rerender(cap, video_path, output_path, changed, compositor, state,
+                                     None if smart else encoder, stats, progress, should_stop)
+            except ffmpeg_tools.FFmpegError as e:
+                logger.info("incremental render of %s unavailable (%s); rendering all frames",
+                            output_path, e)
+                rendered = None
+            if rendered is not None:
+                store.save(output_path, state)
+                return {"mode": "incremental", "frames": total, "frames_rendered": rendered}
+            if stats is not None:
+                stats.reset()
+    finally:
+        cap.release()
+
+    store.forget(output_path)  # the output is about to be overwritten
+    if smart:
+        smart_insert_memes(video_path, output_path, black_segments, memes, zoom_factor, fade_ms,
+                           meme_cache, stats, progress, should_stop)
+    else:
+        insert_memes(video_path, output_path, black_segments, memes, zoom_factor, fade_ms,
+                     meme_cache, stats, encoder, progress, should_stop)
+    store.save(output_path, state)
+    return {"mode": "full", "frames": total, "frames_rendered": total}
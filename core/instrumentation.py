@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Instrumentation for Automatic Meme Filler App.
+Per-stage timers, counters and cache statistics for the processing pipeline.
+Processing functions take an optional ProcessingStats; when none is given
+they bind the plain (untimed) callables up front, so switched-off
+instrumentation adds no per-frame work at all.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+class ProcessingStats:
+    """
+    Collects where processing time goes.
+
+    Stages are named timers ("decode", "convert", "encode", ...). A dotted
+    name ("composite.blend") is a sub-stage: it is reported, but left out
+    of the top-level breakdown so time is not counted twice. Counters track
+    frames and other events; caches are polled for their stats() on
+    snapshot. Safe to read from another thread while a job is updating it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all timers and counters and restart the clock."""
+        with self._lock:
+            self.started = time.perf_counter()
+            self._stages: Dict[str, list] = {}    # stage -> [seconds, calls]
+            self._counters: Dict[str, int] = {}
+            self._caches: Dict[str, object] = {}
+
+    # ----------------- Recording -----------------
+    def add_time(self, stage: str, seconds: float):
+        entry = self._stages.get(stage)
+        if entry is None:
+            with self._lock:
+                entry = self._stages.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def count(self, name: str, n: int = 1):
+        self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time a block: `with stats.timer("load"): ...`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def wrap(self, stage: str, fn: Callable, counter: Optional[str] = None) -> Callable:
+        """
+        Return fn wrapped so every call is timed under `stage` (and bumps
+        `counter`, if given). Used to instrument hot loops without branches.
+        """
+        add_time = self.add_time
+        perf_counter = time.perf_counter
+
+        if counter is None:
+            def timed(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    add_time(stage, perf_counter() - start)
+        else:
+            def timed(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    add_time(stage, perf_counter() - start)
+                    self.count(counter)
+        return timed
+
+    def merge(self, snapshot: Dict):
+        """Add the timers and counters of another collector's snapshot (e.g. from a worker process)."""
+        for name, info in snapshot["stages"].items():
+            with self._lock:
+                entry = self._stages.setdefault(name, [0.0, 0])
+            entry[0] += info["seconds"]
+            entry[1] += info["calls"]
+        for name, n in snapshot["counters"].items():
+            self.count(name, n)
+
+    def track_cache(self, name: str, cache):
+        """Report `cache.stats()` in snapshots under `name`."""
+        with self._lock:
+            self._caches[name] = cache
+
+    # ----------------- Reading -----------------
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def fps(self, counter: str = "frames") -> float:
+        elapsed = self.elapsed()
+        return self._counters.get(counter, 0) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> Dict:
+        """Return all timers, counters and cache stats as plain data."""
+        with self._lock:
+            stages = {name: list(entry) for name, entry in self._stages.items()}
+            counters = dict(self._counters)
+            caches = dict(self._caches)
+        top_total = sum(s for name, (s, _) in stages.items() if "." not in name)
+        return {
+            "elapsed_s": round(self.elapsed(), 4),
+            "fps": round(self.fps(), 1),
+            "stages": {
+                name: {
+                    "seconds": round(seconds, 4),
+                    "calls": calls,
+                    "ms_per_call": round(seconds / calls * 1000, 3) if calls else 0.0,
+                    "share": round(seconds / top_total, 3) if top_total and "." not in name else None,
+                }
+                for name, (seconds, calls) in sorted(stages.items(), key=lambda kv: -kv[1][0])
+            },
+            "counters": counters,
+            "caches": {name: cache.stats() for name, cache in caches.items()},
+        }
+
+    def summary(self, limit: int = 4) -> str:
+        """One-line fps and top-stage breakdown, e.g. for a status bar."""
+        snap = self.snapshot()
+        parts = [f"{name} {info['share'] * 100:.0f}%"
+                 for name, info in snap["stages"].items() if info["share"] is not None][:limit]
+        text = f"{snap['fps']:.1f} fps"
+        return f"{text} | {', '.join(parts)}" if parts else text
+
+    def export(self, path: str):
+        """Write a snapshot to a JSON file for offline profiling."""
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Luma Analysis for Automatic Meme Filler App.
+Batched black frame classification on a small luma proxy of each frame.
+Frames are shrunk to a thumbnail, converted to gray, stacked into batches
+and measured with vectorized NumPy: mean level, a high percentile and the
+fraction of near-black pixels, all from the same pass. Segment decisions
+then use hysteresis and a minimum duration, so dark (but not black) scenes
+and flickering fades don't produce spurious segments.
+"""
+
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from core.instrumentation import ProcessingStats
+
+
+class LumaAnalyzer:
+    """
+    Black frame classifier working on batches of downscaled luma frames.
+
+    A frame enters a black segment when its mean gray level is below
+    `threshold`, its `percentile`-th gray level is below
+    `percentile_threshold` (no bright highlights) and at least
+    `min_black_fraction` of its pixels are at or below `pixel_threshold`.
+    Because the last two tests reject dark scenes, the mean limit can be
+    looser than BLACK_THRESHOLD, which lets grainy black frames through.
+    Inside a segment the mean and percentile limits are multiplied by
+    `hysteresis`, so a frame hovering around the limits doesn't toggle the
+    segment on and off. Segments shorter than `min_frames` are dropped.
+
+    The proxy is `proxy_width` pixels wide and is sampled with bilinear
+    interpolation: an area average would touch every source pixel and cost
+    as much as analysing the full frame.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 16,
+        percentile: float = 95.0,
+        percentile_threshold: float = 40.0,
+        pixel_threshold: int = 24,
+        min_black_fraction: float = 0.9,
+        hysteresis: float = 1.0,
+        min_frames: int = 1,
+        proxy_width: int = 160,
+        batch_size: int = 32
+    ):
+        self.threshold = threshold
+        self.percentile = percentile
+        self.percentile_threshold = percentile_threshold
+        self.pixel_threshold = pixel_threshold
+        self.min_black_fraction = min_black_fraction
+        self.hysteresis = hysteresis
+        self.min_frames = max(1, min_frames)
+        self.proxy_width = proxy_width
+        self.batch_size = max(1, batch_size)
+
+    def settings(self) -> Dict:
+        """All parameters that affect results (e.g. for cache keys)."""
+        return dict(self.__dict__)
+
+    # ----------------- Frame statistics -----------------
+    def proxy_size(self, width: int, height: int) -> Tuple[int, int]:
+        proxy_width = min(self.proxy_width, width)
+        return proxy_width, max(1, round(height * proxy_width / width))
+
+    def frame_stats(self, proxies: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Measure a stack of gray proxies of shape (frames, height, width).
+
+        Returns:
+            (mean levels, percentile levels, near-black fractions), one
+            value per frame.
+        """
+        flat = proxies.reshape(len(proxies), -1)
+        pixels = flat.shape[1]
+        means = flat.mean(axis=1)
+        k = min(pixels - 1, int(self.percentile / 100.0 * (pixels - 1)))
+        highs = np.partition(flat, k, axis=1)[:, k]
+        fractions = np.count_nonzero(flat <= self.pixel_threshold, axis=1) / pixels
+        return means, highs, fractions
+
+    def classify(self, means: np.ndarray, highs: np.ndarray, fractions: np.ndarray) -> np.ndarray:
+        """Frames passing the (strict) entry test, as a boolean array."""
+        return ((means < self.threshold) & (highs < self.percentile_threshold)
+                & (fractions >= self.min_black_fraction))
+
+    def _stays_black(self, mean: float, high: float, fraction: float) -> bool:
+        return (mean < self.threshold * self.hysteresis
+                and high < self.percentile_threshold * self.hysteresis
+                and fraction >= self.min_black_fraction / self.hysteresis)
+
+    # ----------------- Scanning -----------------
+    def iter_segments(
+        self,
+        cap: cv2.VideoCapture,
+        first: int = 0,
+        end: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        total: int = 0,
+        stats: Optional[ProcessingStats] = None
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Classify frames [first, end) read from cap (to end of file if end is
+        None) and yield black segments as they close.
+
+        cap must already be positioned at `first`. progress and should_stop
+        are called once per batch. A segment still open when the range ends
+        is closed at the last frame read.
+        """
+        read = cap.read if stats is None else stats.wrap("decode", cap.read, counter="frames")
+        shrink, convert, measure = cv2.resize, cv2.cvtColor, self.frame_stats
+        if stats is not None:
+            shrink = stats.wrap("proxy", cv2.resize)
+            convert = stats.wrap("convert", cv2.cvtColor)
+            measure = stats.wrap("brightness", self.frame_stats)
+
+        batch = None
+        size = None
+        start = None
+        frame_idx = first
+        done = False
+        while not done:
+            if should_stop is not None and should_stop():
+                return
+            n = 0
+            while n < self.batch_size and (end is None or frame_idx + n < end):
+                ret, frame = read()
+                if not ret:
+                    done = True
+                    break
+                if batch is None:
+                    size = self.proxy_size(frame.shape[1], frame.shape[0])
+                    batch = np.empty((self.batch_size, size[1], size[0]), dtype=np.uint8)
+                small = shrink(frame, size, interpolation=cv2.INTER_LINEAR)
+                convert(small, cv2.COLOR_BGR2GRAY, dst=batch[n])
+                n += 1
+            if end is not None and frame_idx + n >= end:
+                done = True
+            if n == 0:
+                break
+
+            means, highs, fractions = measure(batch[:n])
+            black = self.classify(means, highs, fractions)
+            for i in range(n):
+                idx = frame_idx + i
+                if start is None:
+                    if black[i]:
+                        start = idx
+                elif not (black[i] or self._stays_black(means[i], highs[i], fractions[i])):
+                    if idx - start >= self.min_frames:
+                        yield (start, idx - 1)
+                    start = None
+            frame_idx += n
+            if progress is not None:
+                progress(frame_idx - first, total)
+
+        if start is not None and frame_idx - start >= self.min_frames:
+            yield (start, frame_idx - 1)
+
+    def filter_short(self, segments: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Drop segments shorter than min_frames (e.g. after stitching chunks)."""
+        return [(s, e) for s, e in segments if e - s + 1 >= self.min_frames]
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Prepared Meme Cache for Automatic Meme Filler App.
+Keeps memes already zoomed and cropped to the output size in memory, so each
+meme is decoded and scaled once per render instead of once per frame.
+Animated memes (GIF/MP4) are played back through a pool of reusable decoders.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from core.meme_disk_cache import MemeDiskCache
+from utils.meme_index import ANIMATED_EXTENSIONS
+
+
+def is_animated(meme_path: str) -> bool:
+    """Return True for memes that are played back as frame streams."""
+    return meme_path.lower().endswith(ANIMATED_EXTENSIONS)
+
+
+class MemeDecoderPool:
+    """
+    Bounded pool of open decoders for animated memes.
+
+    A handle remembers which frame it returns next, so playing a meme
+    forward costs one read per frame; anything else is a seek. Once more
+    than `max_open` memes are open, the least recently used one is closed.
+    """
+
+    def __init__(self, max_open: int = 8):
+        self.max_open = max_open
+        self._handles: "OrderedDict[str, list]" = OrderedDict()  # path -> [cap, next_idx]
+        self._info: Dict[str, Tuple[int, float]] = {}
+
+    def _open(self, meme_path: str) -> Optional[list]:
+        handle = self._handles.get(meme_path)
+        if handle is not None:
+            self._handles.move_to_end(meme_path)
+            return handle
+        cap = cv2.VideoCapture(meme_path)
+        if not cap.isOpened():
+            return None
+        handle = [cap, 0]
+        self._handles[meme_path] = handle
+        if meme_path not in self._info:
+            count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            self._info[meme_path] = (count, fps)
+        while len(self._handles) > self.max_open:
+            _, (old_cap, _) = self._handles.popitem(last=False)
+            old_cap.release()
+        return handle
+
+    def info(self, meme_path: str) -> Optional[Tuple[int, float]]:
+        """Return (frame_count, fps), or None if the meme can't be opened."""
+        if meme_path not in self._info and self._open(meme_path) is None:
+            return None
+        return self._info[meme_path]
+
+    def read(self, meme_path: str, index: int) -> Optional[np.ndarray]:
+        """Return raw BGR frame `index` of a meme, or None past its end."""
+        handle = self._open(meme_path)
+        if handle is None:
+            return None
+        cap, next_idx = handle
+        if index != next_idx:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = cap.read()
+        if not ret:
+            handle[1] = -1  # position unknown; seek next time
+            count, fps = self._info[meme_path]
+            if 0 < index < count or count <= 0:
+                # The container over-reported its length; learn the real one.
+                self._info[meme_path] = (index, fps)
+            return None
+        handle[1] = index + 1
+        return frame
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    def close(self):
+        """Release every open decoder."""
+        for cap, _ in self._handles.values():
+            cap.release()
+        self._handles.clear()
+
+
+def prepare_meme(image: np.ndarray, size: Tuple[int, int], zoom_factor: float) -> np.ndarray:
+    """
+    Zoom a meme image and crop its center to the output size.
+
+    Args:
+        image: BGR meme image.
+        size: Output (width, height).
+        zoom_factor: Zoom multiplier (e.g., 2 means 2x zoom).
+
+    Returns:
+        BGR image of exactly `size`.
+    """
+    width, height = size
+    zoomed = cv2.resize(image, (int(width * zoom_factor), int(height * zoom_factor)))
+    start_x = (zoomed.shape[1] - width) // 2
+    start_y = (zoomed.shape[0] - height) // 2
+    return zoomed[start_y:start_y + height, start_x:start_x + width]
+
+
+class PreparedMemeCache:
+    """
+    LRU cache of prepared overlay frames keyed by (meme path, output size,
+    zoom, frame index).
+
+    Still memes have a single frame (index 0). Animated memes are decoded
+    through a MemeDecoderPool; all frames of a short clip are cached, while
+    clips too large to fit in `max_clip_fraction` of the budget are streamed
+    without being cached so they can't flush everything else out.
+    Memes that fail to load are remembered too, so a broken file is only
+    tried once. Entries are evicted least recently used first once the
+    cached pixels exceed `max_bytes`.
+
+    With a MemeDiskCache as `disk_cache`, misses are first looked up on
+    disk (memory-mapped, no decode or resize) and freshly prepared frames
+    are written back, so later runs and other processes can reuse them.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_clip_fraction: float = 0.25,
+                 decoder_pool: Optional[MemeDecoderPool] = None,
+                 disk_cache: Optional[MemeDiskCache] = None):
+        self.max_bytes = max_bytes
+        self.max_clip_fraction = max_clip_fraction
+        self.decoders = decoder_pool if decoder_pool is not None else MemeDecoderPool()
+        self.disk_cache = disk_cache
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Optional[np.ndarray]]" = OrderedDict()
+
+    def get(self, meme_path: str, size: Tuple[int, int], zoom_factor: float,
+            position: float = 0.0) -> Optional[np.ndarray]:
+        """
+        Return the prepared meme frame, or None if the meme can't be read.
+
+        Args:
+            position: Seconds since the meme appeared. Picks the frame of an
+                animated meme (looping if the meme is shorter); ignored for
+                still images.
+        """
+        if is_animated(meme_path):
+            return self._get_animated(meme_path, tuple(size), zoom_factor, position)
+
+        key = (meme_path, tuple(size), zoom_factor, 0)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        prepared = self._from_disk(key)
+        if prepared is None:
+            image = cv2.imread(meme_path)
+            prepared = self._prepare(image, size, zoom_factor)
+            self._to_disk(key, prepared)
+        self._store(key, prepared)
+        return prepared
+
+    def _get_animated(self, meme_path: str, size: Tuple[int, int], zoom_factor: float,
+                      position: float) -> Optional[np.ndarray]:
+        info = self.decoders.info(meme_path)
+        if info is None:
+            return None
+        count, fps = info
+        index = int(position * fps)
+        if count > 0:
+            index %= count
+
+        key = (meme_path, size, zoom_factor, index)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        prepared = self._from_disk(key)
+        if prepared is not None:
+            self._store(key, prepared)
+            return prepared
+
+        image = self.decoders.read(meme_path, index)
+        if image is None and index > 0:
+            # Ran past the real end of the clip (the read taught the pool
+            # its true length): wrap around.
+            count, _ = self.decoders.info(meme_path)
+            if count > 0:
+                index %= count
+                key = (meme_path, size, zoom_factor, index)
+                if key in self._entries:
+                    return self._entries[key]
+                image = self.decoders.read(meme_path, index)
+        prepared = self._prepare(image, size, zoom_factor)
+        frame_bytes = prepared.nbytes if prepared is not None else 0
+        if count <= 0 or count * frame_bytes <= self.max_bytes * self.max_clip_fraction:
+            self._to_disk(key, prepared)
+            self._store(key, prepared)
+        return prepared
+
+    def _from_disk(self, key: Tuple) -> Optional[np.ndarray]:
+        if self.disk_cache is None:
+            return None
+        meme_path, size, zoom_factor, index = key
+        return self.disk_cache.get(meme_path, size, zoom_factor, index)
+
+    def _to_disk(self, key: Tuple, prepared: Optional[np.ndarray]):
+        if self.disk_cache is not None and prepared is not None:
+            meme_path, size, zoom_factor, index = key
+            self.disk_cache.put(meme_path, size, zoom_factor, index, prepared)
+
+    @staticmethod
+    def _prepare(image: Optional[np.ndarray], size: Tuple[int, int],
+                 zoom_factor: float) -> Optional[np.ndarray]:
+        if image is None:
+            return None
+        # Own the pixels, so the full zoomed image can be freed. Prepared
+        # frames are shared (and may be written out as-is), so lock them.
+        prepared = np.ascontiguousarray(prepare_meme(image, size, zoom_factor))
+        prepared.flags.writeable = False
+        return prepared
+
+    def _store(self, key: Tuple, prepared: Optional[np.ndarray]):
+        nbytes = prepared.nbytes if prepared is not None else 0
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = prepared
+        self.current_bytes += nbytes
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted.nbytes if evicted is not None else 0
+
+    def clear(self):
+        """Drop all entries, close pooled decoders and reset the counters."""
+        self._entries.clear()
+        self.decoders.close()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current memory use."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "open_decoders": len(self.decoders),
+            "disk": self.disk_cache.stats() if self.disk_cache is not None else None,
+        }
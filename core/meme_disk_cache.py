@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Meme Disk Cache for Automatic Meme Filler App.
+Persists prepared (zoomed and cropped) meme frames as .npy files that later
+runs and other export processes memory-map instead of decoding and
+rescaling the source image again.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.cache_paths import user_cache_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction runs without a cross-process lock
+    fcntl = None
+
+
+def default_cache_dir() -> str:
+    """Return the per-user directory for prepared meme frames."""
+    return user_cache_dir("memes")
+
+
+class MemeDiskCache:
+    """
+    On-disk cache of prepared meme frames, read back with np.load(mmap_mode="r").
+
+    Entries are keyed by the source file's absolute path, size and mtime
+    plus the target size, zoom factor and frame index, so editing a meme
+    invalidates its entries automatically. The cache directory is capped
+    at `max_bytes`; least recently used entries (by mtime, refreshed on
+    every hit) are evicted first.
+
+    Several processes may share the directory: entries are written to a
+    unique temporary file and renamed into place, so readers never see a
+    partial file, and eviction runs under an exclusive lock file. A file
+    evicted while another process has it mapped stays valid for that
+    process until it is unmapped.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Size on disk, measured on the first put rather than here, so
+        # creating a cache doesn't walk the directory (None: not known yet)
+        self._approx_bytes: Optional[int] = None
+
+    def _entry_path(self, meme_path: str, size: Tuple[int, int], zoom_factor: float,
+                    frame_index: int) -> Optional[str]:
+        try:
+            stat = os.stat(meme_path)
+        except OSError:
+            return None
+        identity = (f"{os.path.abspath(meme_path)}|{stat.st_size}|{stat.st_mtime_ns}|"
+                    f"{size[0]}x{size[1]}|{zoom_factor}|{frame_index}")
+        key = hashlib.sha1(identity.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".npy")
+
+    def get(self, meme_path: str, size: Tuple[int, int], zoom_factor: float,
+            frame_index: int = 0) -> Optional[np.ndarray]:
+        """Return a read-only memory-mapped prepared frame, or None."""
+        entry = self._entry_path(meme_path, size, zoom_factor, frame_index)
+        if entry is None:
+            return None
+        try:
+            frame = np.load(entry, mmap_mode="r")
+            os.utime(entry)  # mark as recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError):
+            # Truncated or corrupt (e.g. disk filled up); drop it.
+            self.misses += 1
+            self._remove(entry)
+            return None
+        self.hits += 1
+        return frame
+
+    def put(self, meme_path: str, size: Tuple[int, int], zoom_factor: float,
+            frame_index: int, frame: np.ndarray) -> None:
+        """Store a prepared frame. Errors (e.g. a full disk) are ignored."""
+        entry = self._entry_path(meme_path, size, zoom_factor, frame_index)
+        if entry is None or frame.nbytes > self.max_bytes:
+            return
+        tmp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(frame))
+            os.replace(tmp_path, entry)
+        except OSError:
+            self._remove(tmp_path)
+            return
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan()[1]  # includes this entry
+            else:
+                self._approx_bytes += frame.nbytes
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan(self):
+        """Return ([(mtime, size, path)], total_bytes) of all entries."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".npy"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def evict(self, target_fraction: float = 0.9) -> None:
+        """Delete least recently used entries until under target_fraction * max_bytes."""
+        lock_file = open(os.path.join(self.cache_dir, ".lock"), "a")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries, total = self._scan()
+            entries.sort()
+            target = self.max_bytes * target_fraction
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
+            with self._lock:
+                self._approx_bytes = total
+        finally:
+            lock_file.close()  # releases the flock
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """Remove every cached frame."""
+        for _, _, path in self._scan()[0]:
+            self._remove(path)
+        with self._lock:
+            self._approx_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return hit/miss counters and the approximate size on disk (None
+        until the first put or eviction has measured it).
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes": self._approx_bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Render Pipeline for Automatic Meme Filler App.
+Runs decode, composite and encode as separate threads connected by bounded
+queues, so reading the next frame and writing the previous one overlap with
+compositing the current one.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import cv2
+
+from core.instrumentation import ProcessingStats
+
+_DONE = object()  # end-of-stream marker passed down the queues
+
+
+class RenderCancelled(Exception):
+    """Raised by run() when should_stop asked the render to stop."""
+
+
+class RenderPipeline:
+    """
+    Decode -> composite -> encode, one thread per stage.
+
+    Each stage is single threaded, so frames stay in order. The queues
+    between stages are bounded: a slow encoder blocks compositing, which
+    blocks decoding, so memory stays at roughly 2 * queue_size frames.
+    Decode buffers are recycled once a frame has been encoded, so after
+    warm-up no frame memory is allocated.
+    Any exception raised in a stage stops the pipeline and is re-raised
+    from run(). Stage timings go to a ProcessingStats ("decode",
+    "composite", "encode" and a "frames" counter of encoded frames), if
+    one is given; otherwise the stages call the plain, untimed callables.
+    progress and should_stop are called from the encode stage, i.e. on the
+    thread that called run().
+    """
+
+    _STAGES = ("decode", "composite", "encode")
+
+    def __init__(self, cap: cv2.VideoCapture, writer, compositor,
+                 first: int = 0, end: Optional[int] = None, queue_size: int = 8,
+                 stats: Optional[ProcessingStats] = None,
+                 progress: Optional[Callable[[int], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            cap: Capture already positioned at `first`.
+            writer: Anything with a write(frame) method.
+            compositor: Object with composite(frame, frame_idx) -> frame.
+            first: Index of the first frame cap will return.
+            end: Stop before this frame index (None reads to end of file).
+            queue_size: Frames buffered between two stages.
+            stats: Collector to record stage timings in (None: no timing).
+            progress: Called with the number of frames written so far,
+                every `progress_every` frames and at the end.
+            should_stop: Polled before each write; once it returns True
+                the pipeline stops and run() raises RenderCancelled.
+        """
+        self.cap = cap
+        self.writer = writer
+        self.compositor = compositor
+        self.first = first
+        self.end = end
+        self._decoded = queue.Queue(maxsize=queue_size)
+        self._composited = queue.Queue(maxsize=queue_size)
+        self._free = queue.SimpleQueue()  # decode buffers ready for reuse
+        self.buffers_allocated = 0
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self.timings = stats
+        self.frames_written = 0
+        self.wall_time = 0.0
+        self.progress = progress
+        self.should_stop = should_stop
+        self.progress_every = 10
+
+    # ----------------- Queue helpers -----------------
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Put with backpressure; gives up (False) once the pipeline stops."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    # ----------------- Stages -----------------
+    def _decode(self):
+        read = self.cap.read
+        if self.timings is not None:
+            read = self.timings.wrap("decode", read)
+        frame_idx = self.first
+        try:
+            while self.end is None or frame_idx < self.end:
+                try:
+                    buffer = self._free.get_nowait()
+                except queue.Empty:
+                    buffer = None
+                    self.buffers_allocated += 1
+                ret, frame = read(buffer)
+                if not ret:
+                    break
+                if not self._put(self._decoded, (frame_idx, frame)):
+                    return
+                frame_idx += 1
+        except BaseException as e:
+            self._fail(e)
+        self._put(self._decoded, _DONE)
+
+    def _composite(self):
+        composite = self.compositor.composite
+        if self.timings is not None:
+            composite = self.timings.wrap("composite", composite)
+        try:
+            while True:
+                item = self._get(self._decoded)
+                if item is _DONE:
+                    break
+                frame_idx, frame = item
+                output = composite(frame, frame_idx)
+                if not self._put(self._composited, (frame, output)):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        self._put(self._composited, _DONE)
+
+    def _encode(self):
+        write = self.writer.write
+        if self.timings is not None:
+            write = self.timings.wrap("encode", write, counter="frames")
+        progress, should_stop = self.progress, self.should_stop
+        while True:
+            item = self._get(self._composited)
+            if item is _DONE:
+                break
+            if should_stop is not None and should_stop():
+                raise RenderCancelled()
+            buffer, output = item
+            write(output)
+            self.frames_written += 1
+            self._free.put(buffer)
+            if progress is not None and self.frames_written % self.progress_every == 0:
+                progress(self.frames_written)
+        if progress is not None:
+            progress(self.frames_written)
+
+    # ----------------- Public API -----------------
+    def run(self) -> int:
+        """Render all frames; returns the number of frames written."""
+        start = time.perf_counter()
+        workers = [
+            threading.Thread(target=self._decode, name="render-decode", daemon=True),
+            threading.Thread(target=self._composite, name="render-composite", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            self._encode()  # encode on the calling thread
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for worker in workers:
+                worker.join()
+            self.wall_time = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+        return self.frames_written
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-stage frames, busy time and throughput (only with a
+        ProcessingStats), plus overall wall fps.
+        """
+        result = {}
+        timed = self._STAGES if self.timings is not None else ()
+        stages = self.timings.snapshot()["stages"] if timed else {}
+        for name in timed:
+            stage = stages.get(name, {"seconds": 0.0, "calls": 0})
+            busy = stage["seconds"]
+            result[name] = {
+                "frames": stage["calls"],
+                "busy_s": round(busy, 4),
+                "fps": round(stage["calls"] / busy, 1) if busy else 0.0,
+            }
+        frames = self.frames_written
+        result["total"] = {
+            "frames": frames,
+            "wall_s": round(self.wall_time, 4),
+            "fps": round(frames / self.wall_time, 1) if self.wall_time else 0.0,
+            "buffers_allocated": self.buffers_allocated,
+        }
+        return result
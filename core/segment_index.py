@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Segment Index for Automatic Meme Filler App.
+Sorted, non-overlapping store of (start, end) frame segments (both ends
+inclusive) with binary-search lookup, so finding the segment at a frame
+stays fast with huge segment counts and the timeline always hands out a
+valid, ordered segment list.
+"""
+
+import bisect
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+Segment = Tuple[int, int]
+
+
+class SegmentIndex:
+    """
+    Segments kept as parallel sorted lists of starts, ends and (start, end)
+    tuples, all updated in place.
+
+    Invariant: starts are strictly increasing and every segment ends before
+    the next one starts, so both lists are sorted and bisect finds the
+    segment at a frame in O(log n). Edits (insert, remove, split) locate
+    their position the same way but then shift the lists, so they are O(n);
+    that is a memmove, cheap next to a repaint even at 10^5 segments.
+    Touching segments (one ending at frame - 1, the next starting at frame)
+    stay separate; that is what a split produces.
+    """
+
+    def __init__(self, segments: Iterable[Segment] = ()):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self._segments: List[Segment] = []
+        self.reset(segments)
+
+    def reset(self, segments: Iterable[Segment]):
+        """Replace the contents; overlapping segments are merged."""
+        self._starts, self._ends = [], []
+        for start, end in sorted((int(s), int(e)) for s, e in segments):
+            if end < start:
+                continue
+            if self._ends and start <= self._ends[-1]:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+        self._segments = list(zip(self._starts, self._ends))
+
+    # ----------------- Queries -----------------
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[Segment]:
+        return iter(self._segments)
+
+    def to_list(self) -> List[Segment]:
+        """Ordered list of segments (a copy; later edits don't change it)."""
+        return list(self._segments)
+
+    def index_at(self, frame: int) -> Optional[int]:
+        """Position of the segment containing `frame`, or None."""
+        i = bisect.bisect_right(self._starts, frame) - 1
+        if i >= 0 and frame <= self._ends[i]:
+            return i
+        return None
+
+    def segment_at(self, frame: int) -> Optional[Segment]:
+        """The segment containing `frame`, or None."""
+        i = self.index_at(frame)
+        return (self._starts[i], self._ends[i]) if i is not None else None
+
+    def overlapping(self, first: int, last: int) -> List[Segment]:
+        """Segments that overlap frames first..last (inclusive)."""
+        lo = bisect.bisect_left(self._ends, first)
+        hi = bisect.bisect_right(self._starts, last)
+        return self._segments[lo:hi]
+
+    # ----------------- Edits -----------------
+    def insert(self, segment: Segment, merge: bool = True) -> Tuple[List[Segment], Segment]:
+        """
+        Insert a segment.
+
+        Args:
+            segment: (start, end), both inclusive.
+            merge: Merge with the segments it overlaps. If False, an
+                overlapping insert raises ValueError.
+
+        Returns:
+            (segments removed by merging, segment actually stored).
+        """
+        start, end = int(segment[0]), int(segment[1])
+        if end < start:
+            raise ValueError(f"Invalid segment {segment}: end before start.")
+        lo = bisect.bisect_left(self._ends, start)
+        hi = bisect.bisect_right(self._starts, end)
+        removed = self._segments[lo:hi]
+        if removed:
+            if not merge:
+                raise ValueError(f"Segment {segment} overlaps {removed[0]}.")
+            start = min(start, removed[0][0])
+            end = max(end, removed[-1][1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+        self._segments[lo:hi] = [(start, end)]
+        return removed, (start, end)
+
+    def remove(self, segment: Segment) -> bool:
+        """Remove a segment exactly as stored. Returns False if absent."""
+        i = bisect.bisect_left(self._starts, segment[0])
+        if i < len(self._starts) and self._starts[i] == segment[0] and self._ends[i] == segment[1]:
+            del self._starts[i]
+            del self._ends[i]
+            del self._segments[i]
+            return True
+        return False
+
+    def split(self, frame: int) -> Optional[Tuple[Segment, Segment, Segment]]:
+        """
+        Split the segment containing `frame` into (start, frame - 1) and
+        (frame, end).
+
+        Returns:
+            (original, left, right), or None if no segment can be split at
+            `frame` (none contains it, or it is the segment's first frame).
+        """
+        i = self.index_at(frame)
+        if i is None or frame <= self._starts[i]:
+            return None
+        start, end = self._starts[i], self._ends[i]
+        self._starts.insert(i + 1, frame)
+        self._ends[i:i + 1] = [frame - 1, end]
+        self._segments[i:i + 1] = [(start, frame - 1), (frame, end)]
+        return (start, end), (start, frame - 1), (frame, end)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Sharded Rendering for Automatic Meme Filler App.
+Splits an export into independent frame ranges, cut only between black
+segments so no meme or fade is split, renders each range in its own
+worker process with its own ffmpeg encoder, and joins the pieces with a
+stream copy. Rendering then scales with the number of cores instead of
+being bound by one decode/composite/encode pipeline.
+"""
+
+import bisect
+import copy
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+
+from core import ffmpeg_tools
+from core.encoders import FFmpegEncoder, default_encoder
+from core.instrumentation import ProcessingStats
+from core.meme_cache import PreparedMemeCache
+from core.meme_disk_cache import MemeDiskCache
+from core.render_pipeline import RenderCancelled, RenderPipeline
+from core.smart_render import PART_EXTENSION
+from core.video_processor import MemeCompositor, insert_memes
+
+# Shards per worker: more than one so a worker that finishes early (e.g.
+# on a stretch with no memes) picks up another shard instead of idling.
+SHARDS_PER_WORKER = 2
+
+# Shortest shard worth a process and an encoder restart (a new keyframe).
+MIN_SHARD_SECONDS = 5.0
+
+
+def plan_shards(
+    black_segments: List[Tuple[int, int]],
+    frame_count: int,
+    shards: int,
+    min_frames: int = 1
+) -> List[Tuple[int, Optional[int]]]:
+    """
+    Split [0, frame_count) into about `shards` ranges of similar length.
+
+    Each cut is moved off any black segment it would fall inside, to that
+    segment's start or to just after its end (whichever is closer), so a
+    segment and its fade are always rendered by one worker. Cuts that would
+    leave a range shorter than `min_frames` are dropped.
+
+    Returns:
+        (first, end) frame ranges in order. The last end is None: it reads
+        to the end of file, since the reported frame count is only an
+        estimate for some containers.
+    """
+    # Overlapping or touching segments are covered as one
+    covered: List[Tuple[int, int]] = []
+    for start, end in sorted(black_segments):
+        if covered and start <= covered[-1][1] + 1:
+            covered[-1] = (covered[-1][0], max(covered[-1][1], end))
+        else:
+            covered.append((start, end))
+    starts = [start for start, _ in covered]
+
+    cuts: List[int] = []
+    for k in range(1, max(1, shards)):
+        cut = round(k * frame_count / shards)
+        i = bisect.bisect_left(starts, cut) - 1
+        if i >= 0 and cut <= covered[i][1]:
+            start, end = covered[i]
+            cut = start if cut - start <= end + 1 - cut else end + 1
+        if cut - (cuts[-1] if cuts else 0) >= min_frames and frame_count - cut >= min_frames:
+            cuts.append(cut)
+    bounds = [0] + cuts
+    return list(zip(bounds, cuts + [None]))
+
+
+# ----------------- Worker process -----------------
+_stop_event = None
+_frames_done = None
+
+
+def _init_worker(stop_event, frames_done):
+    global _stop_event, _frames_done
+    _stop_event = stop_event
+    _frames_done = frames_done
+
+
+def _render_shard(
+    video_path: str,
+    part_path: str,
+    first: int,
+    end: Optional[int],
+    black_segments: List[Tuple[int, int]],
+    memes: List[str],
+    zoom_factor: int,
+    fade_ms: int,
+    encoder: FFmpegEncoder,
+    disk_cache_dir: Optional[str],
+    collect_stats: bool
+) -> Tuple[int, Optional[Dict]]:
+    """
+    Render frames [first, end) into part_path. Runs in a worker process,
+    so it opens its own capture and meme cache.
+
+    Returns:
+        (frames written, stats snapshot or None).
+    """
+    stats = ProcessingStats() if collect_stats else None
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("Could not open input video.")
+    frame_rate = cap.get(cv2.CAP_PROP_FPS)
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    disk_cache = MemeDiskCache(disk_cache_dir) if disk_cache_dir else None
+    # The full segment list, so every segment gets the meme it would get in insert_memes
+    compositor = MemeCompositor(black_segments, memes, size, int(frame_rate), zoom_factor,
+                                fade_ms, PreparedMemeCache(disk_cache=disk_cache), stats)
+    reported = [0]
+
+    def report(written: int):
+        with _frames_done.get_lock():
+            _frames_done.value += written - reported[0]
+        reported[0] = written
+
+    writer = encoder.open(part_path, size, frame_rate)
+    try:
+        written = RenderPipeline(cap, writer, compositor, first, end, stats=stats,
+                                 progress=report, should_stop=_stop_event.is_set).run()
+    finally:
+        cap.release()
+        writer.release()
+    return written, (stats.snapshot() if stats is not None else None)
+
+
+# ----------------- Export -----------------
+def sharded_insert_memes(
+    video_path: str,
+    output_path: str,
+    black_segments: List[Tuple[int, int]],
+    memes: List[str],
+    zoom_factor: int = 2,
+    fade_ms: int = 500,
+    meme_cache: Optional[PreparedMemeCache] = None,
+    stats: Optional[ProcessingStats] = None,
+    encoder=None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    workers: Optional[int] = None
+) -> List[Tuple[int, Optional[int]]]:
+    """
+    insert_memes rendered by several worker processes at once.
+
+    The video is split with plan_shards into SHARDS_PER_WORKER ranges per
+    worker (none shorter than MIN_SHARD_SECONDS), each range is encoded
+    with the same settings into its own piece, and the pieces are joined
+    without re-encoding; the source audio is muxed in at the end. Each
+    piece starts on a keyframe, which costs a little size per shard.
+
+    Needs an FFmpegEncoder (the default when ffmpeg is installed). With
+    an OpenCVEncoder, one worker, or a video too short to split, this is
+    plain insert_memes. If the encoder's threads are 0, each worker's
+    encoder gets an equal share of the cores. Workers share meme_cache's
+    disk tier, if it has one; its in-memory tier stays in this process.
+    stats gets the workers' stage timings (summed over workers, so they
+    can add up to more than the wall time) plus "concat". progress is
+    called with (frames written, total frames) a few times per second
+    and should_stop is polled as often; a stop leaves no output behind.
+
+    Args:
+        workers: Worker processes (default: one per core).
+
+    Returns:
+        The (first, end) shards that were rendered.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    if encoder is None:
+        encoder = default_encoder()
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("Could not open input video.")
+    frame_rate = cap.get(cv2.CAP_PROP_FPS)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    shards = [(0, None)]
+    if workers > 1 and isinstance(encoder, FFmpegEncoder) and total > 0:
+        shards = plan_shards(black_segments, total, workers * SHARDS_PER_WORKER,
+                             max(1, int(frame_rate * MIN_SHARD_SECONDS)))
+    if len(shards) == 1:
+        insert_memes(video_path, output_path, black_segments, memes, zoom_factor, fade_ms,
+                     meme_cache, stats, encoder, progress, should_stop)
+        return shards
+
+    workers = min(workers, len(shards))
+    shard_encoder = encoder
+    if encoder.threads == 0:
+        # Share the cores instead of starting a full-width encoder per worker
+        shard_encoder = copy.copy(encoder)
+        shard_encoder.threads = max(1, (os.cpu_count() or 1) // workers)
+    disk_cache = meme_cache.disk_cache if meme_cache is not None else None
+    disk_cache_dir = disk_cache.cache_dir if disk_cache is not None else None
+
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".sharded-render-") as tmp:
+        parts = [os.path.join(tmp, f"shard{i:05d}{PART_EXTENSION}") for i in range(len(shards))]
+        stop_event = multiprocessing.Event()
+        frames_done = multiprocessing.Value("q", 0)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(stop_event, frames_done)) as pool:
+            futures = {
+                pool.submit(_render_shard, video_path, part, first, end, black_segments, memes,
+                            zoom_factor, fade_ms, shard_encoder, disk_cache_dir,
+                            stats is not None): (first, end)
+                for part, (first, end) in zip(parts, shards)
+            }
+            pending = set(futures)
+            try:
+                while pending:
+                    done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    if should_stop is not None and should_stop():
+                        raise RenderCancelled()
+                    for future in done:
+                        written, snapshot = future.result()
+                        first, end = futures[future]
+                        if end is not None and written != end - first:
+                            raise RuntimeError(f"Could not decode frames {first}-{end - 1}.")
+                        if snapshot is not None:
+                            stats.merge(snapshot)
+                    if progress is not None:
+                        progress(frames_done.value, total)
+            except BaseException:
+                # Stop the running shards too, so leaving the pool doesn't wait for them
+                stop_event.set()
+                for future in pending:
+                    future.cancel()
+                raise
+
+        video_only = os.path.join(tmp, "video" + os.path.splitext(output_path)[1])
+        if stats is None:
+            ffmpeg_tools.concat(parts, video_only)
+        else:
+            with stats.timer("concat"):
+                ffmpeg_tools.concat(parts, video_only)
+        if not (encoder.audio and encoder.mux_audio(video_only, video_path, output_path)):
+            os.replace(video_only, output_path)
+    return shards
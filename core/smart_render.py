@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Smart Rendering for Automatic Meme Filler App.
+Re-encodes only the keyframe-aligned ranges around black segments and
+stream-copies everything else from the source, then splices the pieces
+back together with ffmpeg.
+"""
+
+import bisect
+import os
+import tempfile
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+
+from core import ffmpeg_tools
+from core.encoders import FFmpegEncoder
+from core.instrumentation import ProcessingStats
+from core.meme_cache import PreparedMemeCache
+from core.render_pipeline import RenderCancelled, RenderPipeline
+from core.video_processor import MemeCompositor
+
+# Container for the intermediate pieces. MPEG-TS carries codec parameters
+# in-band, so re-encoded and copied pieces can be concatenated even though
+# their encoder settings differ.
+PART_EXTENSION = ".ts"
+
+# Seek this far past a keyframe's pts so float rounding never lands on the
+# keyframe before it. Far less than one frame at any real frame rate.
+_SEEK_EPSILON = 0.001
+
+
+def plan_smart_render(
+    black_segments: List[Tuple[int, int]],
+    keyframes: List[int],
+    frame_count: int
+) -> List[Tuple[int, int, bool]]:
+    """
+    Split [0, frame_count) into ranges to re-encode or stream-copy.
+
+    Each black segment is widened to the keyframe at or before its start and
+    the first keyframe after its end; overlapping windows are merged. Every
+    range therefore starts on a keyframe, so copied ranges need no decoding.
+
+    Returns:
+        List of (first_frame, end_frame_exclusive, re_encode) in frame order.
+    """
+    windows = []
+    for start, end in sorted(black_segments):
+        start, end = max(0, start), min(end, frame_count - 1)
+        if start > end:
+            continue
+        i = max(0, bisect.bisect_right(keyframes, start) - 1)
+        first = keyframes[i] if keyframes and keyframes[i] <= start else 0
+        j = bisect.bisect_right(keyframes, end)
+        last = keyframes[j] if j < len(keyframes) else frame_count
+        if windows and first <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], last))
+        else:
+            windows.append((first, last))
+
+    plan = []
+    pos = 0
+    for first, last in windows:
+        if pos < first:
+            plan.append((pos, first, False))
+        plan.append((first, last, True))
+        pos = last
+    if pos < frame_count:
+        plan.append((pos, frame_count, False))
+    return plan
+
+
+def smart_insert_memes(
+    video_path: str,
+    output_path: str,
+    black_segments: List[Tuple[int, int]],
+    memes: List[str],
+    zoom_factor: int = 2,
+    fade_ms: int = 500,
+    meme_cache: Optional[PreparedMemeCache] = None,
+    stats: Optional[ProcessingStats] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> List[Tuple[int, int, bool]]:
+    """
+    Like insert_memes, but only re-encodes the ranges the memes touch.
+
+    Frames outside those ranges are passed through bit for bit in the
+    source codec; re-encoded ranges use the same codec, pixel format and
+    bitrate so the pieces can be joined without another encode. Requires
+    ffmpeg and ffprobe. `stats` gets the same stage timings as insert_memes
+    for re-encoded frames, plus "copy" for stream-copied ranges.
+    progress and should_stop work as for insert_memes; copied ranges count
+    as done once copied, and a stop leaves no output behind. The source's
+    audio is muxed in as FFmpegEncoder does.
+
+    Returns:
+        The render plan that was executed (see plan_smart_render).
+    """
+    info = ffmpeg_tools.probe_video(video_path)
+    frame_times, keyframes = ffmpeg_tools.probe_frames(video_path)
+    plan = plan_smart_render(black_segments, keyframes, len(frame_times))
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("Could not open input video.")
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    size = (info["width"], info["height"])
+    compositor = MemeCompositor(black_segments, memes, size, fps,
+                                zoom_factor, fade_ms, meme_cache, stats)
+
+    codec_args = ["-c:v", info["codec"], "-pix_fmt", info["pix_fmt"]]
+    if info["bit_rate"]:
+        codec_args += ["-b:v", str(info["bit_rate"])]
+
+    base, ext = os.path.splitext(output_path)
+    spliced_path = f"{base}.smart-video{ext}"
+    try:
+        splice_render(cap, video_path, spliced_path, plan, frame_times, compositor, size,
+                      info["frame_rate"], codec_args, stats, progress, should_stop)
+        mux_spliced_audio(spliced_path, video_path, output_path)
+    finally:
+        cap.release()
+        if os.path.exists(spliced_path):
+            os.remove(spliced_path)
+    return plan
+
+
+def mux_spliced_audio(
+    spliced_path: str,
+    source_path: str,
+    output_path: str,
+    muxer: Optional[FFmpegEncoder] = None,
+    audio: bool = True
+):
+    """
+    Move the video-only `spliced_path` to `output_path`, muxing in the
+    audio of `source_path` (if it has any and `audio` is set) with
+    `muxer`, an FFmpegEncoder by default. The output is replaced in one
+    rename, so a failed mux leaves any previous output untouched.
+    """
+    base, ext = os.path.splitext(output_path)
+    muxed_path = f"{base}.with-audio{ext}"
+    try:
+        # The spliced pieces are video only; take the audio from the source again
+        if audio and (muxer or FFmpegEncoder()).mux_audio(spliced_path, source_path, muxed_path):
+            os.replace(muxed_path, output_path)
+        else:
+            os.replace(spliced_path, output_path)
+    finally:
+        if os.path.exists(muxed_path):
+            os.remove(muxed_path)
+
+
+def splice_render(
+    cap: cv2.VideoCapture,
+    copy_source: str,
+    output_path: str,
+    plan: List[Tuple[int, int, bool]],
+    frame_times: List[float],
+    compositor: MemeCompositor,
+    size: Tuple[int, int],
+    frame_rate,
+    codec_args: List[str],
+    stats: Optional[ProcessingStats] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> None:
+    """
+    Execute a render plan: re-encode its ranges from cap through the
+    compositor, stream-copy the others from `copy_source`, and join the
+    pieces into output_path.
+
+    copy_source must have the same frames (by index) as cap; frame_times
+    and the plan's range starts refer to copy_source, whose keyframes the
+    plan must start its copied ranges on.
+    """
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".smart-render-") as tmp:
+        parts = []
+        total = len(frame_times)
+        for i, (first, end, re_encode) in enumerate(plan):
+            if should_stop is not None and should_stop():
+                raise RenderCancelled()
+            part = os.path.join(tmp, f"part{i:05d}{PART_EXTENSION}")
+            report = None if progress is None else (
+                lambda written, done=first: progress(done + written, total))
+            if re_encode:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+                writer = ffmpeg_tools.FFmpegFrameWriter(part, size, frame_rate, codec_args)
+                try:
+                    written = RenderPipeline(cap, writer, compositor, first, end, stats=stats,
+                                             progress=report, should_stop=should_stop).run()
+                finally:
+                    writer.release()
+                if written != end - first:
+                    raise RuntimeError(f"Could not decode frames {first}-{end - 1}.")
+            elif stats is None:
+                ffmpeg_tools.copy_range(copy_source, part, frame_times[first] + _SEEK_EPSILON,
+                                        end - first)
+            else:
+                with stats.timer("copy"):
+                    ffmpeg_tools.copy_range(copy_source, part, frame_times[first] + _SEEK_EPSILON,
+                                            end - first)
+                stats.count("frames", end - first)
+            if report is not None and not re_encode:
+                report(end - first)
+            parts.append(part)
+        ffmpeg_tools.concat(parts, output_path)
@@ -4,58 +4,502 @@ Video Processor for Automatic Meme Filler App.
 Stage 8: Adds zoom intensity and fade-out effect for inserted memes.
 """
 
+import bisect
+import copy
+import logging
+import os
+import time
 import cv2
 import numpy as np
-from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
+from core.encoders import OpenCVEncoder
+from core.instrumentation import ProcessingStats
+from core.luma_analysis import LumaAnalyzer
+from core.meme_cache import PreparedMemeCache
+from core.render_pipeline import RenderCancelled, RenderPipeline
 
-def detect_black_frames(video_path: str) -> List[Tuple[int, int]]:
+logger = logging.getLogger(__name__)
+
+
+BLACK_THRESHOLD = 10  # mean gray level below which a frame counts as black
+
+
+def _is_black(frame: np.ndarray, threshold: float) -> bool:
+    """Return True if the mean brightness of a BGR frame is below threshold."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return gray.mean() < threshold
+
+
+def _black_classifier(stats: Optional[ProcessingStats]) -> Callable[[np.ndarray, float], bool]:
+    """Return _is_black, or a variant timing "convert" and "brightness"."""
+    if stats is None:
+        return _is_black
+    convert = stats.wrap("convert", cv2.cvtColor)
+    brightness = stats.wrap("brightness", np.mean)
+
+    def is_black(frame: np.ndarray, threshold: float) -> bool:
+        return brightness(convert(frame, cv2.COLOR_BGR2GRAY)) < threshold
+    return is_black
+
+
+def detect_black_frames(
+    video_path: str,
+    threshold: float = BLACK_THRESHOLD,
+    sample_step: int = 1,
+    seek: bool = False,
+    workers: int = 1,
+    chunk_frames: Optional[int] = None,
+    stats: Optional[ProcessingStats] = None,
+    analyzer: Optional[LumaAnalyzer] = None
+) -> List[Tuple[int, int]]:
     """
     Detect black frames (segments where brightness is very low).
 
+    Args:
+        video_path: Path to input video.
+        threshold: Mean brightness below which a frame counts as black.
+        sample_step: Classify only every Nth frame and refine the transitions
+            found back to exact frame boundaries. The result equals the full
+            scan's when every black segment and every gap between two
+            segments is at least ``sample_step`` frames long. Shorter runs
+            can fall between two samples unseen: a short segment is then
+            dropped, and a short gap merges the segments on either side.
+        seek: With sample_step > 1, seek straight to each sampled frame
+            instead of decoding through the frames in between. Faster once
+            sample_step is well above the keyframe interval of the video.
+        workers: Number of processes to scan with. With more than one, the
+            frame range is split into chunks that are scanned in parallel,
+            each with its own seeked capture, and segments crossing a chunk
+            boundary are stitched back together. Every frame is classified,
+            so the result is identical to the serial full scan.
+        chunk_frames: Frames per chunk when workers > 1. Defaults to an even
+            split giving each worker about four chunks.
+        stats: Collects per-stage timings and frame counts. The parallel
+            mode only reports its total time under "detect", since the work
+            happens in other processes.
+        analyzer: Classify frames in batches on a small luma proxy with a
+            LumaAnalyzer (which then replaces `threshold`) instead of
+            averaging every full-resolution pixel. Works with the full and
+            parallel scans, not with sample_step > 1.
+
     Returns:
         List of (start_frame, end_frame) tuples.
     """
+    if analyzer is not None and sample_step > 1:
+        raise ValueError("A LumaAnalyzer can't be combined with sample_step > 1.")
+    if workers > 1:
+        if stats is None:
+            return _detect_black_frames_parallel(video_path, threshold, workers, chunk_frames, analyzer)
+        with stats.timer("detect"):
+            return _detect_black_frames_parallel(video_path, threshold, workers, chunk_frames, analyzer)
+    if sample_step > 1:
+        return _detect_black_frames_sampled(video_path, threshold, sample_step, seek, stats)
+
+    return list(iter_black_frames(video_path, threshold, stats=stats, analyzer=analyzer))
+
+
+def iter_black_frames(
+    video_path: str,
+    threshold: float = BLACK_THRESHOLD,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[ProcessingStats] = None,
+    analyzer: Optional[LumaAnalyzer] = None
+) -> Iterator[Tuple[int, int]]:
+    """
+    Stream black segments, yielding each one as soon as it closes.
+
+    Args:
+        video_path: Path to input video.
+        threshold: Mean brightness below which a frame counts as black.
+        progress: Called as progress(frames_processed, total_frames) after
+            every frame. total_frames is the container's estimate (0 if
+            unknown).
+        should_stop: Polled before every frame; returning True ends the scan
+            early. A segment still open at that point is not yielded.
+        stats: Collects "decode", "convert" and "brightness" timings and a
+            "frames" counter (plus "proxy" with an analyzer).
+        analyzer: Use batched luma-proxy classification (see
+            detect_black_frames). progress and should_stop are then called
+            once per batch instead of once per frame.
+
+    Yields:
+        (start_frame, end_frame) tuples in frame order.
+    """
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
-        return []
+        return
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    try:
+        if analyzer is not None:
+            yield from analyzer.iter_segments(cap, 0, None, progress, should_stop, total, stats)
+        else:
+            yield from _iter_frame_range(cap, threshold, 0, None, progress, should_stop, total, stats)
+    finally:
+        cap.release()
 
-    segments = []
-    threshold = 10  # brightness threshold
+
+def _iter_frame_range(
+    cap: cv2.VideoCapture,
+    threshold: float,
+    first: int,
+    end: Optional[int],
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    total: int = 0,
+    stats: Optional[ProcessingStats] = None
+) -> Iterator[Tuple[int, int]]:
+    """
+    Classify frames [first, end) read from cap (to end of file if end is None).
+
+    cap must already be positioned at `first`. A segment still open when the
+    range ends is closed at the last frame read.
+    """
+    read = cap.read if stats is None else stats.wrap("decode", cap.read, counter="frames")
+    is_black = _black_classifier(stats)
     start = None
-    frame_idx = 0
+    frame_idx = first
 
-    while True:
-        ret, frame = cap.read()
+    while end is None or frame_idx < end:
+        if should_stop is not None and should_stop():
+            return
+        ret, frame = read()
         if not ret:
-            if start is not None:
-                segments.append((start, frame_idx - 1))
             break
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        brightness = gray.mean()
-
-        if brightness < threshold:
+        if is_black(frame, threshold):
             if start is None:
                 start = frame_idx
         else:
             if start is not None:
-                segments.append((start, frame_idx - 1))
+                yield (start, frame_idx - 1)
                 start = None
 
         frame_idx += 1
+        if progress is not None:
+            progress(frame_idx - first, total)
+
+    if start is not None:
+        yield (start, frame_idx - 1)
+
+
+def _detect_black_frames_sampled(
+    video_path: str,
+    threshold: float,
+    step: int,
+    seek: bool,
+    stats: Optional[ProcessingStats] = None
+) -> List[Tuple[int, int]]:
+    """
+    Coarse-to-fine black segment detection.
+
+    Only every `step`-th frame is classified; the frames in between are either
+    grabbed without being converted or analysed, or skipped with a seek.
+    Whenever two consecutive samples disagree, the frames between them are
+    re-read from a second capture and classified one by one, so segment
+    boundaries come out frame exact. Two samples that agree are taken to
+    have no transition between them, which holds only if no segment or gap
+    is shorter than `step` (see detect_black_frames).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return []
+
+    is_black = _black_classifier(stats)
+    refine = None      # second capture used to re-read transition windows
+    refine_pos = -1    # next frame index the refine capture will return
+    segments = []
+    start = None
+    last = -1          # highest frame index classified so far
+
+    def feed(idx: int, black: bool):
+        nonlocal start, last
+        if black:
+            if start is None:
+                start = idx
+        elif start is not None:
+            segments.append((start, idx - 1))
+            start = None
+        last = idx
+
+    def classify_range(first: int, end: int):
+        """Classify every frame in [first, end) with the refine capture."""
+        nonlocal refine, refine_pos
+        if first >= end:
+            return
+        if refine is None:
+            refine = cv2.VideoCapture(video_path)
+        if refine_pos != first:
+            refine.set(cv2.CAP_PROP_POS_FRAMES, first)
+        for idx in range(first, end):
+            ret, frame = refine.read()
+            if not ret:
+                refine_pos = -1
+                return
+            feed(idx, is_black(frame, threshold))
+            if stats is not None:
+                stats.count("frames_refined")
+        refine_pos = end
+
+    prev_idx = -1
+    prev_black = False
+
+    def sample(idx: int, frame: np.ndarray):
+        nonlocal prev_idx, prev_black
+        black = is_black(frame, threshold)
+        if stats is not None:
+            stats.count("frames_sampled")
+        if black != prev_black:
+            classify_range(prev_idx + 1, idx)
+        feed(idx, black)
+        prev_idx, prev_black = idx, black
+
+    if seek:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for frame_idx in range(0, frame_count, step):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            sample(frame_idx, frame)
+    else:
+        frame_count = 0
+        while cap.grab():
+            if frame_count % step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                sample(frame_count, frame)
+            frame_count += 1
+
+    # The frames after the last sample were never looked at.
+    classify_range(prev_idx + 1, frame_count)
+    if start is not None:
+        segments.append((start, last))
 
     cap.release()
+    if refine is not None:
+        refine.release()
     return segments
 
 
+def _scan_frame_range(
+    video_path: str,
+    threshold: float,
+    first: int,
+    end: Optional[int],
+    analyzer: Optional[LumaAnalyzer] = None
+) -> List[Tuple[int, int]]:
+    """
+    Scan frames [first, end) of a video (to the end of file if end is None).
+
+    Segments still open when the range ends are closed at the last frame read.
+    Runs in a worker process, so it opens its own capture.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return []
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    if analyzer is not None:
+        segments = list(analyzer.iter_segments(cap, first, end))
+    else:
+        segments = list(_iter_frame_range(cap, threshold, first, end))
+    cap.release()
+    return segments
+
+
+def _detect_black_frames_parallel(
+    video_path: str,
+    threshold: float,
+    workers: int,
+    chunk_frames: Optional[int],
+    analyzer: Optional[LumaAnalyzer] = None
+) -> List[Tuple[int, int]]:
+    """
+    Scan the video in chunks across a process pool and stitch the results.
+
+    With an analyzer, the minimum duration is applied after stitching (a
+    segment may be split across chunks); hysteresis restarts at each chunk.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return []
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if frame_count <= 0:
+        # Unknown length (some streams/containers): nothing to split on.
+        return detect_black_frames(video_path, threshold, analyzer=analyzer)
+
+    if not chunk_frames:
+        chunk_frames = -(-frame_count // (workers * 4))
+    chunk_frames = max(1, chunk_frames)
+    bounds = list(range(0, frame_count, chunk_frames))
+    # The last chunk reads to end of file, since the reported frame count
+    # is only an estimate for some containers.
+    ends = bounds[1:] + [None]
+    chunk_analyzer = None
+    if analyzer is not None:
+        chunk_analyzer = copy.copy(analyzer)
+        chunk_analyzer.min_frames = 1
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+        results = pool.map(
+            _scan_frame_range,
+            [video_path] * len(bounds), [threshold] * len(bounds), bounds, ends,
+            [chunk_analyzer] * len(bounds)
+        )
+
+        segments: List[Tuple[int, int]] = []
+        for first, chunk in zip(bounds, results):
+            if (chunk and segments and segments[-1][1] == first - 1
+                    and chunk[0][0] == first):
+                # Segment runs across the chunk boundary.
+                segments[-1] = (segments[-1][0], chunk[0][1])
+                chunk = chunk[1:]
+            segments.extend(chunk)
+    if analyzer is not None:
+        segments = analyzer.filter_short(segments)
+    return segments
+
+
+class MemeCompositor:
+    """
+    Composites memes over black segments, one frame at a time.
+
+    Segment i gets memes[i % len(memes)]. Animated memes play from their
+    first frame at the start of the segment, in step with the video's clock.
+    Whether (and how) a frame is covered depends only on its index, so any
+    frame range of a video can be rendered on its own.
+
+    Once its memes are prepared, the hot path allocates nothing: blends are
+    written into the input frame (dst=), fully opaque frames return the
+    cached meme itself, fully faded frames return the input untouched, and
+    the fade-out alphas are computed once up front.
+    """
+
+    def __init__(
+        self,
+        black_segments: List[Tuple[int, int]],
+        memes: List[str],
+        size: Tuple[int, int],
+        fps: int,
+        zoom_factor: int = 2,
+        fade_ms: int = 500,
+        meme_cache: Optional[PreparedMemeCache] = None,
+        stats: Optional[ProcessingStats] = None
+    ):
+        self.size = size
+        self.fps = fps
+        self.zoom_factor = zoom_factor
+        self.fade_frames = int((fade_ms / 1000.0) * fps)
+        self.meme_cache = meme_cache if meme_cache is not None else PreparedMemeCache()
+
+        # Bound once so the hot path has no instrumentation branches.
+        self._get_meme = self.meme_cache.get
+        self._blend = cv2.addWeighted
+        if stats is not None:
+            self._get_meme = stats.wrap("composite.meme_load", self.meme_cache.get)
+            self._blend = stats.wrap("composite.blend", cv2.addWeighted)
+            stats.track_cache("prepared_memes", self.meme_cache)
+
+        order = sorted(range(len(black_segments)), key=lambda i: black_segments[i][0])
+        self._starts = [black_segments[i][0] for i in order]
+        self._ends = [black_segments[i][1] for i in order]
+        self._memes = [memes[i % len(memes)] if memes else None for i in order]
+
+        # Fade-out alpha indexed by frames left in the segment (end - frame).
+        # Every segment shares the same curve; further out alpha is 1.0.
+        self._fade_curve = [max(0.0, left / max(1, self.fade_frames))
+                            for left in range(self.fade_frames + 1)]
+
+        # Per-frame cost counters (see cost()).
+        self._frames = 0
+        self._seconds = 0.0
+        self._blended = 0
+        self._replaced = 0
+        self._output_copies = 0
+
+    def segment_at(self, frame_idx: int) -> Optional[int]:
+        """Return the index (in start order) of the segment covering a frame."""
+        i = bisect.bisect_right(self._starts, frame_idx) - 1
+        if i >= 0 and frame_idx <= self._ends[i]:
+            return i
+        return None
+
+    def alpha_at(self, segment: int, frame_idx: int) -> float:
+        """Meme opacity for a frame inside a segment."""
+        left = self._ends[segment] - frame_idx
+        return self._fade_curve[left] if left <= self.fade_frames else 1.0
+
+    def composite(self, frame: np.ndarray, frame_idx: int) -> np.ndarray:
+        """
+        Return the output frame for `frame` at index `frame_idx`.
+
+        The input frame may be blended into in place, and the result may be
+        a shared cached meme image; treat it as read-only.
+        """
+        t = time.perf_counter()
+        self._frames += 1
+        result = self._composite(frame, frame_idx)
+        self._seconds += time.perf_counter() - t
+        return result
+
+    def _composite(self, frame: np.ndarray, frame_idx: int) -> np.ndarray:
+        i = self.segment_at(frame_idx)
+        if i is None or self._memes[i] is None:
+            return frame
+        alpha = self.alpha_at(i, frame_idx)
+        if alpha <= 0.0:
+            return frame
+        # Zoomed and center-cropped to the video size
+        position = (frame_idx - self._starts[i]) / max(1, self.fps)
+        meme_resized = self._get_meme(self._memes[i], self.size, self.zoom_factor, position)
+        if meme_resized is None:
+            return frame
+
+        if alpha >= 1.0:
+            self._replaced += 1
+            return meme_resized
+        self._blended += 1
+        if frame.flags.writeable:
+            return self._blend(meme_resized, alpha, frame, 1 - alpha, 0, dst=frame)
+        self._output_copies += 1
+        return self._blend(meme_resized, alpha, frame, 1 - alpha, 0)
+
+    def cost(self) -> Dict[str, float]:
+        """
+        Per-frame cost of compositing so far.
+
+        `output_copies` counts blends written to a new buffer because the
+        input frame was read-only. It covers only the blend itself: memes
+        prepared on a cache miss (resize, animated frame decode) show up in
+        the meme cache's stats, not here.
+        """
+        return {
+            "frames": self._frames,
+            "us_per_frame": round(self._seconds / self._frames * 1e6, 2) if self._frames else 0.0,
+            "blended": self._blended,
+            "replaced": self._replaced,
+            "passed_through": self._frames - self._blended - self._replaced,
+            "output_copies": self._output_copies,
+        }
+
+
 def insert_memes(
     video_path: str,
     output_path: str,
     black_segments: List[Tuple[int, int]],
     memes: List[str],
     zoom_factor: int = 2,
-    fade_ms: int = 500
+    fade_ms: int = 500,
+    meme_cache: Optional[PreparedMemeCache] = None,
+    stats: Optional[ProcessingStats] = None,
+    encoder=None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
 ) -> None:
     """
     Replace black segments with memes, applying zoom and fade effects.
@@ -67,60 +511,52 @@ def insert_memes(
         memes: List of meme file paths to insert.
         zoom_factor: Zoom multiplier for memes (e.g., 2 means 2x zoom).
         fade_ms: Fade-out duration in milliseconds.
+        meme_cache: Cache of prepared meme frames. Pass one in to share it
+            across renders; by default a fresh cache is used for this render.
+        stats: Collects "decode", "composite" (with "composite.meme_load"
+            and "composite.blend") and "encode" timings, a "frames" counter
+            and the meme cache's hit/miss statistics.
+        encoder: Encoder backend from core.encoders. FFmpegEncoder encodes
+            multithreaded with tunable quality and keeps the source audio;
+            the default is OpenCVEncoder (mp4v, no audio).
+        progress: Called with (frames_written, total_frames) as the render
+            advances; total_frames is 0 if the container doesn't say.
+        should_stop: Polled once per frame; returning True stops the render,
+            deletes the partial output and raises RenderCancelled.
     """
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise RuntimeError("Could not open input video.")
 
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    frame_rate = cap.get(cv2.CAP_PROP_FPS)
+    fps = int(frame_rate)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fade_frames = int((fade_ms / 1000.0) * fps)
-
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
-    segment_idx = 0
-    meme_idx = 0
-    black_start, black_end = (black_segments[segment_idx]
-                              if black_segments else (None, None))
+    if encoder is None:
+        encoder = OpenCVEncoder()
+    try:
+        out = encoder.open(output_path, (width, height), frame_rate, video_path)
+    except Exception:
+        cap.release()
+        raise
 
-    frame_idx = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if black_start is not None and black_start <= frame_idx <= black_end:
-            meme_path = memes[meme_idx % len(memes)]
-            meme_img = cv2.imread(meme_path)
-            if meme_img is not None:
-                # Apply zoom
-                zoomed = cv2.resize(meme_img, (int(width * zoom_factor), int(height * zoom_factor)))
-                # Crop center to fit video size
-                start_x = (zoomed.shape[1] - width) // 2
-                start_y = (zoomed.shape[0] - height) // 2
-                meme_resized = zoomed[start_y:start_y + height, start_x:start_x + width]
-
-                # Apply fade-out at the end of the segment
-                segment_length = black_end - black_start + 1
-                fade_start = black_end - fade_frames
-                alpha = 1.0
-                if frame_idx >= fade_start:
-                    alpha = max(0.0, (black_end - frame_idx) / max(1, fade_frames))
-                frame = cv2.addWeighted(meme_resized, alpha, frame, 1 - alpha, 0)
-
-        out.write(frame)
-
-        if black_start is not None and frame_idx > black_end:
-            segment_idx += 1
-            meme_idx += 1
-            if segment_idx < len(black_segments):
-                black_start, black_end = black_segments[segment_idx]
-            else:
-                black_start, black_end = None, None
-
-        frame_idx += 1
-
-    cap.release()
-    out.release()
+    compositor = MemeCompositor(black_segments, memes, (width, height), fps,
+                                zoom_factor, fade_ms, meme_cache, stats)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    report = None if progress is None else (lambda written: progress(written, total))
+    pipeline = RenderPipeline(cap, out, compositor, stats=stats,
+                              progress=report, should_stop=should_stop)
+    cancelled = False
+    try:
+        pipeline.run()
+    except RenderCancelled:
+        cancelled = True
+        raise
+    finally:
+        cap.release()
+        out.release()
+        if cancelled and os.path.exists(output_path):
+            os.remove(output_path)
+    logger.info("insert_memes %s: %s, compositing %s",
+                output_path, pipeline.stats(), compositor.cost())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+JobManager - Runs long GUI tasks (detection, preview warm-up, exports) on
+thread pools, so the window stays responsive and every task can be stopped.
+Each kind of job has its own pool and concurrency limit. Jobs report
+progress and check for cancellation through their Job object; everything
+they hand back reaches the GUI thread as queued Qt signals.
+"""
+
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raise inside a job function to stop early; the job ends as cancelled."""
+
+
+class Job:
+    """
+    One background task: `fn(job)` runs on a pool thread and returns the
+    job's result. It should call report_progress() as it goes and stop
+    soon after is_cancelled() turns True.
+    """
+
+    # Progress updates sent to the GUI per second, at most
+    UPDATES_PER_SECOND = 10
+
+    def __init__(self, job_id: int, kind: str, title: str, fn: Callable[["Job"], Any]):
+        self.id = job_id
+        self.kind = kind
+        self.title = title
+        self.fn = fn
+        self.state = QUEUED
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error: Optional[str] = None
+        self.created = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._manager: Optional["JobManager"] = None
+        self._last_update = 0.0
+
+    # ----------------- Called from the job -----------------
+    def is_cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def report_progress(self, done: int, total: int):
+        """Record progress; the GUI hears about it a few times per second."""
+        self.done, self.total = done, total
+        now = time.monotonic()
+        if now - self._last_update >= 1.0 / self.UPDATES_PER_SECOND or (total and done >= total):
+            self._last_update = now
+            self._manager.jobUpdated.emit(self.id)
+
+    def emit(self, value: Any):
+        """Hand a partial result (e.g. one detected segment) to the GUI thread."""
+        self._manager.jobOutput.emit(self.id, value)
+
+    # ----------------- Status -----------------
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    def fraction(self) -> Optional[float]:
+        """Share of the work done, or None if the total is unknown."""
+        if not self.total:
+            return None
+        return min(1.0, self.done / self.total)
+
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def eta(self) -> Optional[float]:
+        """Seconds left at the average rate so far, or None if unknown."""
+        fraction = self.fraction()
+        if self.state != RUNNING or not fraction:
+            return None
+        return self.elapsed() * (1.0 - fraction) / fraction
+
+
+class _JobRunnable(QRunnable):
+    def __init__(self, manager: "JobManager", job: Job):
+        super().__init__()
+        self.setAutoDelete(False)  # the manager keeps it, so tryTake() can find it
+        self.manager = manager
+        self.job = job
+
+    def run(self):
+        self.manager._run(self.job)
+
+
+class JobManager(QObject):
+    jobAdded = pyqtSignal(int)           # job id
+    jobUpdated = pyqtSignal(int)         # job id; state or progress changed
+    jobOutput = pyqtSignal(int, object)  # job id, partial result
+    jobFinished = pyqtSignal(int)        # job id; done, failed or cancelled
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = 1,
+                 keep_finished: int = 20):
+        """
+        Args:
+            limits: Most jobs of each kind running at once, e.g.
+                {"export": 2}. Further jobs wait in the queue.
+            default_limit: Limit for kinds not in `limits`.
+            keep_finished: Finished jobs kept in jobs() for display.
+        """
+        super().__init__()
+        self.default_limit = default_limit
+        self.keep_finished = keep_finished
+        self._limits = dict(limits or {})
+        self._pools: Dict[str, QThreadPool] = {}
+        self._jobs: Dict[int, Job] = {}
+        self._runnables: Dict[int, _JobRunnable] = {}
+        self._ids = itertools.count(1)
+
+    # ----------------- Limits -----------------
+    def limit(self, kind: str) -> int:
+        return self._limits.get(kind, self.default_limit)
+
+    def set_limit(self, kind: str, limit: int):
+        """Change how many jobs of a kind run at once; queued jobs start as slots free up."""
+        self._limits[kind] = max(1, limit)
+        if kind in self._pools:
+            self._pools[kind].setMaxThreadCount(self._limits[kind])
+
+    def _pool(self, kind: str) -> QThreadPool:
+        if kind not in self._pools:
+            pool = QThreadPool(self)
+            pool.setMaxThreadCount(self.limit(kind))
+            self._pools[kind] = pool
+        return self._pools[kind]
+
+    # ----------------- Jobs -----------------
+    def submit(self, kind: str, title: str, fn: Callable[[Job], Any], exclusive: bool = False) -> Job:
+        """
+        Queue `fn(job)` to run on the pool for `kind`.
+
+        Args:
+            exclusive: Cancel the other active jobs of this kind first (for
+                work that a newer request makes obsolete).
+        """
+        if exclusive:
+            self.cancel_all(kind)
+        job = Job(next(self._ids), kind, title, fn)
+        job._manager = self
+        runnable = _JobRunnable(self, job)
+        self._jobs[job.id] = job
+        self._runnables[job.id] = runnable
+        self._prune()
+        self.jobAdded.emit(job.id)
+        self._pool(kind).start(runnable)
+        return job
+
+    def _run(self, job: Job):
+        """Pool thread: run one job and publish how it ended."""
+        if job.is_cancelled():
+            job.state = CANCELLED
+        else:
+            job.state = RUNNING
+            job.started = time.monotonic()
+            self.jobUpdated.emit(job.id)
+            try:
+                job.result = job.fn(job)
+                job.state = CANCELLED if job.is_cancelled() else DONE
+            except JobCancelled:
+                job.state = CANCELLED
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                job.state = CANCELLED if job.is_cancelled() else FAILED
+        job.finished = time.monotonic()
+        self._runnables.pop(job.id, None)
+        self.jobFinished.emit(job.id)
+
+    def cancel(self, job_id: int):
+        """Cancel a job: a queued one is dropped, a running one asked to stop."""
+        job = self._jobs.get(job_id)
+        if job is None or not job.active:
+            return
+        job._cancel.set()
+        runnable = self._runnables.get(job_id)
+        if job.state == QUEUED and runnable is not None and self._pool(job.kind).tryTake(runnable):
+            del self._runnables[job_id]
+            job.state = CANCELLED
+            job.finished = time.monotonic()
+            self.jobFinished.emit(job.id)
+            # Never started: forget it rather than list it as cancelled
+            del self._jobs[job_id]
+            self.jobUpdated.emit(job.id)
+        else:
+            self.jobUpdated.emit(job.id)
+
+    def cancel_all(self, kind: Optional[str] = None):
+        for job in self.active(kind):
+            self.cancel(job.id)
+
+    def job(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """All known jobs, oldest first."""
+        return list(self._jobs.values())
+
+    def active(self, kind: Optional[str] = None) -> List[Job]:
+        return [job for job in self._jobs.values() if job.active and (kind is None or job.kind == kind)]
+
+    def clear_finished(self):
+        self._forget([job.id for job in self._jobs.values() if not job.active])
+
+    def _prune(self):
+        finished = [job.id for job in self._jobs.values() if not job.active]
+        self._forget(finished[:max(0, len(finished) - self.keep_finished)])
+
+    def _forget(self, job_ids: List[int]):
+        for job_id in job_ids:
+            del self._jobs[job_id]
+            self.jobUpdated.emit(job_id)  # lets views drop the job
+
+    def shutdown(self, timeout_ms: int = 10000) -> bool:
+        """Cancel everything and wait for running jobs. Returns False on timeout."""
+        self.cancel_all()
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        for pool in self._pools.values():
+            remaining = max(0, int((deadline - time.monotonic()) * 1000))
+            if not pool.waitForDone(remaining):
+                return False
+        return True
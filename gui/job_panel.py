@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+JobPanel widget listing the JobManager's queued, running and finished jobs
+with progress and ETA, plus controls to cancel jobs and to set how many
+exports may run at once.
+"""
+
+from typing import Dict, Optional
+
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTreeWidget, QTreeWidgetItem,
+    QPushButton, QLabel, QSpinBox, QHeaderView
+)
+from PyQt6.QtCore import Qt
+
+from gui.job_manager import FAILED, JobManager
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return ""
+    seconds = int(round(seconds))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class JobPanel(QWidget):
+    COLUMNS = ("Job", "Status", "Progress", "ETA / Time")
+
+    def __init__(self, manager: JobManager, export_kind: str = "export"):
+        super().__init__()
+        self.manager = manager
+        self.export_kind = export_kind
+        self._items: Dict[int, QTreeWidgetItem] = {}
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(self.COLUMNS)
+        self.tree.setRootIsDecorated(False)
+        self.tree.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.tree.setMaximumHeight(110)
+        layout.addWidget(self.tree)
+
+        controls = QHBoxLayout()
+        cancel_btn = QPushButton("Cancel Job")
+        cancel_btn.clicked.connect(self.cancel_selected)
+        controls.addWidget(cancel_btn)
+        clear_btn = QPushButton("Clear Finished")
+        clear_btn.clicked.connect(self.clear_finished)
+        controls.addWidget(clear_btn)
+        controls.addStretch(1)
+        controls.addWidget(QLabel("Concurrent exports"))
+        self.limit_spin = QSpinBox()
+        self.limit_spin.setRange(1, 8)
+        self.limit_spin.setValue(manager.limit(export_kind))
+        self.limit_spin.valueChanged.connect(lambda n: manager.set_limit(export_kind, n))
+        controls.addWidget(self.limit_spin)
+        layout.addLayout(controls)
+
+        manager.jobAdded.connect(self.update_job)
+        manager.jobUpdated.connect(self.update_job)
+        manager.jobFinished.connect(self.update_job)
+
+    def update_job(self, job_id: int):
+        job = self.manager.job(job_id)
+        item = self._items.get(job_id)
+        if job is None:  # dropped before it started, or pruned
+            if item is not None:
+                self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
+                del self._items[job_id]
+            return
+        if item is None:
+            item = QTreeWidgetItem([job.title, "", "", ""])
+            item.setData(0, Qt.ItemDataRole.UserRole, job_id)
+            self.tree.addTopLevelItem(item)
+            self._items[job_id] = item
+        fraction = job.fraction()
+        if fraction is not None:
+            progress = f"{fraction * 100:.0f}%"
+        else:
+            progress = f"{job.done}" if job.done else ""
+        status = job.state if job.state != FAILED else f"failed: {job.error}"
+        item.setText(1, status)
+        item.setText(2, progress)
+        item.setText(3, format_seconds(job.eta()) if job.active else format_seconds(job.elapsed()))
+        item.setToolTip(1, status)
+
+    def cancel_selected(self):
+        for item in self.tree.selectedItems():
+            self.manager.cancel(item.data(0, Qt.ItemDataRole.UserRole))
+
+    def clear_finished(self):
+        self.manager.clear_finished()
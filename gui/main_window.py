@@ -4,7 +4,7 @@ MainWindow for Automatic Meme Filler App with in-app video preview.
 Stage 10: Plays video inside the app using OpenCV + QLabel.
 """
 
-import sys, os, tempfile, cv2
+import sys, os, shutil
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -16,8 +16,20 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QImage, QPixmap
 
-from core.video_processor import detect_black_frames, insert_memes
-from utils.meme_loader import get_random_memes, load_meme_library
+from core.detection_cache import DetectionCache
+from core.encoders import default_encoder
+from core.ffmpeg_tools import FFmpegError
+from core.incremental_render import RenderStateStore, incremental_insert_memes
+from core.render_pipeline import RenderCancelled
+from core.luma_analysis import LumaAnalyzer
+from core.meme_cache import PreparedMemeCache
+from core.meme_disk_cache import MemeDiskCache
+from core.video_processor import MemeCompositor, ProcessingStats, iter_black_frames
+from utils.meme_index import MemeIndex
+from utils.meme_sampler import MemeSampler
+from gui.job_manager import CANCELLED, DONE, JobCancelled, JobManager
+from gui.job_panel import JobPanel
+from gui.playback import PlaybackEngine
 from gui.timeline_editor import TimelineEditor
 from gui.timeline_view import TimelineView
 
@@ -29,16 +41,54 @@ class MemeFillerApp(QMainWindow):
         self.setMinimumSize(900, 700)
 
         self.video_path = None
-        self.timeline = TimelineEditor()
-        self.meme_library = load_meme_library("memes")
+        self.timeline = TimelineEditor(coalesce_seconds=0.3)  # rapid clicks undo together
+        self.detection_cache = DetectionCache()
+        self.analyzer = LumaAnalyzer()
+        self.encoder = default_encoder()  # ffmpeg (with audio) when installed
+        self.render_states = RenderStateStore()  # lets re-exports redo only what changed
+        # Prepared frames persist across runs on disk. The live preview runs on
+        # the playback thread, so it gets its own in-memory tier.
+        # Each export job gets its own in-memory tier (see start_export).
+        self.disk_cache = MemeDiskCache()
+        self.preview_meme_cache = PreparedMemeCache(disk_cache=self.disk_cache)
+        self.stats = ProcessingStats()  # timings of the latest detection/export job
+        # Detection, preview warm-up and exports run here, off the GUI thread
+        self.jobs = JobManager(limits={"detect": 1, "preview": 1, "export": 2})
+        self.jobs.jobOutput.connect(self.on_job_output)
+        self.jobs.jobUpdated.connect(self.on_job_updated)
+        self.jobs.jobFinished.connect(self.on_job_finished)
+        self.meme_index = MemeIndex("memes")
+        self.meme_index.refresh()
+        self.meme_library = self.meme_index.library()
+        self.meme_sampler = MemeSampler(self.meme_library)
         self.selected_categories = set()
 
-        # Video preview variables
-        self.cap = None
+        # Video preview variables: frames are decoded on the player's thread,
+        # the timer only presents the ones that are due
+        self.player = None
         self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
         self.timer.timeout.connect(self.next_frame)
         self.playing = False
 
+        # Meme per segment, kept across previews and exports so an edit only
+        # changes the memes (and re-rendered frames) of the segments it touched
+        self.segment_memes = {}
+
+        # Live meme preview: composited onto frames as they are shown
+        self.preview_compositor = None
+        self.preview_warm_key = None
+
+        # Segments streamed in by detection are drawn at most this often
+        self.refresh_timer = QTimer()
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(100)
+        self.refresh_timer.timeout.connect(self.refresh_timeline)
+
+        # Background black frame detection
+        self.detect_job = None
+        self.detected_segments = []
+
         # --- Central widget ---
         central = QWidget()
         self.setCentralWidget(central)
@@ -75,6 +125,8 @@ class MemeFillerApp(QMainWindow):
             btn = QPushButton(btn_text)
             btn.clicked.connect(handler)
             btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+            if btn_text == "Detect Black Frames":
+                self.detect_btn = btn
             if btn_text in ("Undo", "Redo"):
                 btn.setEnabled(False)
                 if btn_text == "Undo":
@@ -88,6 +140,8 @@ class MemeFillerApp(QMainWindow):
         self.tool_picker = QComboBox()
         self.tool_picker.addItems(["Marker Tool", "Split Tool", "Selection Tool"])
         self.tool_picker.currentIndexChanged.connect(self.change_tool)
+        self.tool_picker.setToolTip("Selection Tool only seeks; the Marker and Split tools "
+                                    "also edit the timeline where you click.")
         layout.addWidget(self.tool_picker)
 
         # --- Sliders ---
@@ -97,6 +151,7 @@ class MemeFillerApp(QMainWindow):
         self.zoom_slider.setMinimum(1)
         self.zoom_slider.setMaximum(5)
         self.zoom_slider.setValue(2)
+        self.zoom_slider.valueChanged.connect(self.update_preview)
         sliders_layout.addWidget(QLabel("Zoom Intensity"))
         sliders_layout.addWidget(self.zoom_slider)
 
@@ -104,6 +159,7 @@ class MemeFillerApp(QMainWindow):
         self.fade_slider.setMinimum(0)
         self.fade_slider.setMaximum(2000)
         self.fade_slider.setValue(500)
+        self.fade_slider.valueChanged.connect(self.update_preview)
         sliders_layout.addWidget(QLabel("Fade-out Duration (ms)"))
         sliders_layout.addWidget(self.fade_slider)
 
@@ -129,6 +185,7 @@ class MemeFillerApp(QMainWindow):
         # --- Preview & Export ---
         action_btns = QHBoxLayout()
         self.preview_btn = QPushButton("Preview Memes")
+        self.preview_btn.setCheckable(True)
         self.preview_btn.clicked.connect(self.preview_memes)
         action_btns.addWidget(self.preview_btn)
 
@@ -136,8 +193,20 @@ class MemeFillerApp(QMainWindow):
         self.export_btn.clicked.connect(self.export_video)
         action_btns.addWidget(self.export_btn)
 
+        # Re-encode only around the memes; needs ffmpeg + ffprobe
+        self.smart_render_cb = QCheckBox("Smart Render")
+        self.smart_render_cb.setToolTip("Copy unchanged parts of the video instead of re-encoding them (requires FFmpeg).")
+        has_ffmpeg = bool(shutil.which("ffmpeg") and shutil.which("ffprobe"))
+        self.smart_render_cb.setEnabled(has_ffmpeg)
+        self.smart_render_cb.setChecked(has_ffmpeg)
+        action_btns.addWidget(self.smart_render_cb)
+
         layout.addLayout(action_btns)
 
+        # --- Background jobs ---
+        self.job_panel = JobPanel(self.jobs)
+        layout.addWidget(self.job_panel)
+
         # --- Status bar ---
         self.status_label = QLabel("Load a video to get started.")
         self.status_label.setFrameStyle(QFrame.Shape.Panel | QFrame.Shadow.Sunken)
@@ -146,64 +215,118 @@ class MemeFillerApp(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
 
+        # Live fps + stage breakdown of the running job
+        self.stats_label = QLabel()
+        self.status_bar.addPermanentWidget(self.stats_label)
+        save_stats_btn = QPushButton("Save Stats")
+        save_stats_btn.clicked.connect(self.save_stats)
+        self.status_bar.addPermanentWidget(save_stats_btn)
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self.refresh_stats)
+
     # ----------------- Video Player Functions -----------------
     def toggle_play(self):
-        if not self.cap:
+        if not self.player:
             return
         if self.playing:
             self.timer.stop()
+            self.player.pause()
             self.play_btn.setText("Play")
             self.playing = False
         else:
-            self.timer.start(int(1000 / max(self.cap.get(cv2.CAP_PROP_FPS), 24)))
+            if self.player.at_end():
+                self.player.seek(0)
+            self.player.play()
+            # Poll twice per frame; the player's clock decides what is due
+            self.timer.start(max(1, int(500 / self.player.fps)))
             self.play_btn.setText("Pause")
             self.playing = True
 
     def stop_video(self):
-        if self.cap:
+        if self.player:
             self.timer.stop()
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.player.pause()
+            self.player.seek(0)
             self.play_btn.setText("Play")
             self.playing = False
-            self.next_frame()
+            self.show_current_frame()
 
     def next_frame(self):
-        if not self.cap:
+        if not self.player:
             return
-        ret, frame = self.cap.read()
-        if not ret:
+        item = self.player.next_frame()
+        if item is not None:
+            self.show_frame(*item)
+        elif self.player.at_end():
             self.timer.stop()
+            self.player.pause()
             self.play_btn.setText("Play")
             self.playing = False
-            return
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def show_current_frame(self):
+        """Show the frame at the player's position (after a seek or change while paused)."""
+        item = self.player.current_frame() if self.player else None
+        if item is not None:
+            self.show_frame(*item)
+
+    def show_frame(self, idx: int, frame_rgb):
+        """Display a frame the player already converted and scaled."""
         h, w, ch = frame_rgb.shape
         bytes_per_line = ch * w
         q_img = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        pixmap = QPixmap.fromImage(q_img).scaled(
-            self.video_label.width(), self.video_label.height(),
-            Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
-        )
-        self.video_label.setPixmap(pixmap)
+        self.video_label.setPixmap(QPixmap.fromImage(q_img))
+        self.timeline_view.set_playhead(idx)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.player:
+            self.player.set_display_size(self.video_label.width(), self.video_label.height())
+            if not self.playing:
+                self.show_current_frame()
 
     # ----------------- Existing Logic -----------------
     def refresh_timeline(self):
         if not self.video_path:
             return
-        total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.cap else 1000
+        total_frames = self.player.frame_count if self.player else 1000
         self.timeline_view.set_segments(self.timeline.get_segments(), total_frames)
+        self.update_preview()
 
     def on_timeline_click(self, frame: int):
+        """Seek to the clicked frame; the Marker and Split tools also edit there."""
+        if self.player:
+            self.player.seek(frame)
+            if not self.playing:
+                self.show_current_frame()
         tool = self.timeline.active_tool
         if tool == "Marker Tool":
             self.timeline.add_marker(frame)
         elif tool == "Split Tool":
             self.timeline.split_segment(frame)
-        elif tool == "Selection Tool":
-            self.timeline.add_marker(frame)
+        else:
+            return  # Selection Tool: navigation only, the timeline stays as it is
         self.refresh_timeline()
         self.update_undo_redo_buttons()
 
+    def start_stats(self, stats: ProcessingStats):
+        """Show the stats of a newly started job in the live readout."""
+        self.stats = stats
+        self.stats_timer.start(500)
+
+    def finish_stats(self):
+        if not self.jobs.active("detect") and not self.jobs.active("export"):
+            self.stats_timer.stop()
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        self.stats_label.setText(self.stats.summary())
+
+    def save_stats(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Processing Stats", "stats.json", "JSON Files (*.json)")
+        if path:
+            self.stats.export(path)
+            self.update_status(f"Stats saved: {path}")
+
     def update_status(self, text: str):
         self.status_label.setText(text)
         self.status_bar.showMessage(text, 5000)
@@ -216,26 +339,118 @@ class MemeFillerApp(QMainWindow):
     def load_video(self):
         path, _ = QFileDialog.getOpenFileName(self, "Select Video", "", "Video Files (*.mp4 *.avi *.mov)")
         if path:
-            if self.cap:
-                self.cap.release()
-            self.cap = cv2.VideoCapture(path)
-            if not self.cap.isOpened():
+            if self.detect_job is not None:
+                self.cancel_detection()
+            self.stop_preview()
+            self.close_player()
+            try:
+                self.player = PlaybackEngine(path)
+            except RuntimeError:
                 QMessageBox.critical(self, "Error", "Could not open video.")
                 return
+            self.player.set_display_size(self.video_label.width(), self.video_label.height())
             self.video_path = path
+            self.segment_memes.clear()
             self.update_status(f"Loaded video: {os.path.basename(path)}")
             self.stop_video()
 
     def detect_black_frames(self):
+        if self.detect_job is not None:
+            self.jobs.cancel(self.detect_job.id)
+            self.update_status("Cancelling detection...")
+            return
         if not self.video_path:
             QMessageBox.warning(self, "No Video", "Please load a video first.")
             return
-        self.update_status("Detecting black frames...")
-        segments = detect_black_frames(self.video_path)
-        self.timeline.set_segments(segments)
+        cached = self.detection_cache.get(self.video_path, analyzer=self.analyzer)
+        if cached is not None:
+            self.timeline.set_segments(cached)
+            self.refresh_timeline()
+            self.update_status(f"Detected {len(cached)} black segments (cached).")
+            self.update_undo_redo_buttons()
+            return
+
+        # Record the whole detection as one undo step, then stream into it.
+        self.timeline.set_segments([])
         self.refresh_timeline()
-        self.update_status(f"Detected {len(segments)} black segments.")
         self.update_undo_redo_buttons()
+        self.detected_segments = []
+
+        video_path, analyzer, stats = self.video_path, self.analyzer, ProcessingStats()
+
+        def detect(job):
+            for segment in iter_black_frames(video_path, progress=job.report_progress,
+                                             should_stop=job.is_cancelled, stats=stats,
+                                             analyzer=analyzer):
+                job.emit(segment)
+            return video_path
+
+        self.start_stats(stats)
+        self.detect_job = self.jobs.submit("detect", f"Detect {os.path.basename(video_path)}", detect)
+        self.detect_btn.setText("Cancel Detection")
+        self.update_status("Detecting black frames...")
+
+    def on_job_output(self, job_id: int, value):
+        if self.detect_job is None or job_id != self.detect_job.id:
+            return  # late output from a cancelled scan
+        self.detected_segments.append(value)
+        self.timeline.append_segment(value)
+        if not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+
+    def on_job_updated(self, job_id: int):
+        job = self.detect_job
+        if job is None or job_id != job.id or not job.active:
+            return
+        progress = f"{job.done * 100 // job.total}%" if job.total else f"{job.done} frames"
+        self.status_label.setText(
+            f"Detecting black frames... {progress} ({len(self.detected_segments)} segments)"
+        )
+
+    def on_job_finished(self, job_id: int):
+        job = self.jobs.job(job_id)
+        if job is None:
+            return
+        if job.kind == "detect" and job is self.detect_job:
+            self.on_detection_finished(job)
+        elif job.kind == "export":
+            self.on_export_finished(job)
+
+    def on_detection_finished(self, job):
+        self.detect_job = None
+        self.detect_btn.setText("Detect Black Frames")
+        self.finish_stats()
+        self.refresh_timer.stop()
+        self.refresh_timeline()  # draw the segments still waiting for the timer
+        count = len(self.detected_segments)
+        if job.state == DONE:
+            self.detection_cache.put(job.result, self.detected_segments, analyzer=self.analyzer)
+            self.update_status(f"Detected {count} black segments.")
+        elif job.state == CANCELLED:
+            self.update_status(f"Detection cancelled after {count} black segments.")
+        else:
+            self.update_status(f"Detection failed: {job.error}")
+
+    def cancel_detection(self):
+        """Stop streaming the running detection into the timeline."""
+        if self.detect_job is None:
+            return
+        self.jobs.cancel(self.detect_job.id)
+        self.detect_job = None
+        self.detect_btn.setText("Detect Black Frames")
+
+    def close_player(self):
+        if self.player:
+            self.timer.stop()
+            self.playing = False
+            self.play_btn.setText("Play")
+            self.player.close()
+            self.player = None
+
+    def closeEvent(self, event):
+        self.jobs.shutdown()
+        self.close_player()
+        super().closeEvent(event)
 
     def undo_edit(self):
         updated = self.timeline.undo()
@@ -265,26 +480,98 @@ class MemeFillerApp(QMainWindow):
             cb = self.category_layout.itemAt(i).widget()
             if cb.isChecked():
                 self.selected_categories.add(cb.text())
-
+        self.segment_memes.clear()  # draw new memes from the new categories
+        if self.preview_compositor is not None:
+            self.update_preview()
+
+    def memes_for(self, segments: list) -> list:
+        """
+        One meme per segment. Segments that already have a meme keep it;
+        new ones (e.g. the halves of a split) draw from the sampler. Empty
+        if the selected categories hold no memes.
+        """
+        missing = [segment for segment in segments if segment not in self.segment_memes]
+        if missing:
+            drawn = self.meme_sampler.sample(self.selected_categories, len(missing))
+            if not drawn:
+                return []
+            self.segment_memes.update(zip(missing, drawn))
+        return [self.segment_memes[segment] for segment in segments]
+
+    # ----------------- Live Preview -----------------
     def preview_memes(self):
+        """Toggle live preview: memes are composited onto frames as they play."""
+        if self.preview_compositor is not None:
+            self.stop_preview()
+            self.update_status("Meme preview off.")
+            return
+        self.preview_btn.setChecked(False)
         if not self.video_path:
             QMessageBox.warning(self, "No Video", "Please load a video first.")
             return
         if not self.timeline.get_segments():
             QMessageBox.warning(self, "No Black Frames", "No black frames detected.")
             return
-        memes = get_random_memes(self.meme_library, self.selected_categories, len(self.timeline.get_segments()))
-        if not memes:
+        if not self.memes_for(self.timeline.get_segments()):
             QMessageBox.warning(self, "No Memes", "No memes available for the selected categories.")
             return
-        zoom_factor = self.zoom_slider.value()
-        fade_ms = self.fade_slider.value()
-        temp_path = os.path.join(tempfile.gettempdir(), "preview_with_memes.mp4")
-        insert_memes(self.video_path, temp_path, self.timeline.get_segments(), memes,
-                     zoom_factor=zoom_factor, fade_ms=fade_ms)
-        self.cap.release()
-        self.cap = cv2.VideoCapture(temp_path)
-        self.stop_video()
+        self.preview_btn.setChecked(True)
+        self.preview_btn.setText("Stop Preview")
+        self.build_preview()
+        self.update_status("Meme preview on: play the video, timeline and slider changes show up live.")
+
+    def build_preview(self):
+        """(Re)build the preview compositor from the current segments and sliders."""
+        segments = self.timeline.get_segments()
+        memes = self.memes_for(segments)
+        size = (self.player.width, self.player.height)
+        self.preview_compositor = MemeCompositor(
+            segments, memes, size, int(self.player.fps),
+            zoom_factor=self.zoom_slider.value(), fade_ms=self.fade_slider.value(),
+            meme_cache=self.preview_meme_cache
+        )
+        self.player.set_compositor(self.preview_compositor)
+        self.warm_preview(list(dict.fromkeys(memes)),
+                          size, self.zoom_slider.value())
+
+    def warm_preview(self, memes: list, size, zoom_factor: int):
+        """
+        Prepare the previewed memes in the background, so playback finds
+        them in the shared disk cache instead of stalling to decode them.
+        """
+        key = (tuple(memes), size, zoom_factor)
+        if key == self.preview_warm_key:
+            return
+        self.preview_warm_key = key
+        disk_cache = self.disk_cache
+
+        def warm(job):
+            cache = PreparedMemeCache(disk_cache=disk_cache)
+            for i, meme in enumerate(memes):
+                job.check_cancelled()
+                cache.get(meme, size, zoom_factor)
+                job.report_progress(i + 1, len(memes))
+
+        self.jobs.submit("preview", "Prepare preview memes", warm, exclusive=True)
+
+    def update_preview(self):
+        """Apply timeline, slider or category changes to the live preview."""
+        if self.preview_compositor is None or not self.player:
+            return
+        self.build_preview()
+        if not self.playing:
+            self.show_current_frame()  # redraw the paused frame
+
+    def stop_preview(self):
+        self.preview_compositor = None
+        self.preview_warm_key = None
+        self.jobs.cancel_all("preview")
+        self.preview_btn.setChecked(False)
+        self.preview_btn.setText("Preview Memes")
+        if self.player:
+            self.player.set_compositor(None)
+            if not self.playing:
+                self.show_current_frame()
 
     def export_video(self):
         if not self.video_path:
@@ -298,18 +585,60 @@ class MemeFillerApp(QMainWindow):
             return
         if not output_path.lower().endswith(".mp4"):
             output_path += ".mp4"
-        memes = get_random_memes(self.meme_library, self.selected_categories, len(self.timeline.get_segments()))
+        memes = self.memes_for(self.timeline.get_segments())  # what is (or was) previewed
         if not memes:
             QMessageBox.warning(self, "No Memes", "No memes available for the selected categories.")
             return
+        self.start_export(output_path, list(memes))
+
+    def start_export(self, output_path: str, memes: list):
+        """Queue an export of the current timeline; several can run at once."""
+        video_path = self.video_path
+        segments = list(self.timeline.get_segments())  # later edits don't affect this export
         zoom_factor = self.zoom_slider.value()
         fade_ms = self.fade_slider.value()
-        try:
-            insert_memes(self.video_path, output_path, self.timeline.get_segments(), memes,
-                         zoom_factor=zoom_factor, fade_ms=fade_ms)
-            self.update_status(f"Video exported successfully: {output_path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Export Error", str(e))
+        smart = self.smart_render_cb.isChecked()
+        encoder = self.encoder
+        render_states = self.render_states
+        # Meme caches aren't thread safe: one in-memory tier per export
+        meme_cache = PreparedMemeCache(disk_cache=self.disk_cache)
+        stats = ProcessingStats()
+
+        def export(job):
+            render_args = dict(zoom_factor=zoom_factor, fade_ms=fade_ms, meme_cache=meme_cache,
+                               stats=stats, progress=job.report_progress,
+                               should_stop=job.is_cancelled)
+            try:
+                note = ""
+                render_args.update(encoder=encoder, store=render_states)
+                try:
+                    result = incremental_insert_memes(video_path, output_path, segments, memes,
+                                                      smart=smart, **render_args)
+                except FFmpegError as e:
+                    if not smart:
+                        raise
+                    note = f" (smart render unavailable: {e})"
+                    stats.reset()
+                    result = incremental_insert_memes(video_path, output_path, segments, memes,
+                                                      **render_args)
+                if result["mode"] != "full":
+                    note += f" ({result['frames_rendered']} of {result['frames']} frames re-rendered)"
+                return f"Video exported successfully{note}: {output_path}"
+            except RenderCancelled:
+                raise JobCancelled()
+
+        self.start_stats(stats)
+        self.jobs.submit("export", f"Export {os.path.basename(output_path)}", export)
+        self.update_status(f"Exporting {os.path.basename(output_path)}...")
+
+    def on_export_finished(self, job):
+        self.finish_stats()
+        if job.state == DONE:
+            self.update_status(job.result)
+        elif job.state == CANCELLED:
+            self.update_status(f"{job.title} cancelled.")
+        else:
+            QMessageBox.critical(self, "Export Error", job.error)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+PlaybackEngine - Decodes video for the preview off the GUI thread.
+A decoder thread reads frames, applies the live meme overlay, converts
+them to RGB and scales them to the display size into a small ring buffer.
+The GUI only pulls ready-to-show frames, paced by the wall clock: frames
+that are already late are dropped instead of slowing playback down.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class PlaybackEngine:
+    """
+    Background decoder plus presentation clock for one video.
+
+    The decoder thread owns the cv2.VideoCapture. Anything that changes
+    what a frame looks like (seeking, a new compositor, a new display size)
+    flushes the buffer and restarts decoding at the current position;
+    frames decoded for an outdated request are discarded by generation.
+    """
+
+    def __init__(self, video_path: str, buffer_size: int = 16):
+        self.video_path = video_path
+        self.buffer_size = buffer_size
+        self._cap = cv2.VideoCapture(video_path)
+        if not self._cap.isOpened():
+            raise RuntimeError("Could not open video.")
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        self._cond = threading.Condition()
+        self._buffer: "deque[Tuple[int, np.ndarray]]" = deque()
+        self._generation = 0
+        self._seek_to: Optional[int] = 0
+        self._eof = False
+        self._stop = False
+        self._compositor = None
+        self._display_size = (self.width, self.height)
+
+        self.position = 0        # index of the frame on screen
+        self.playing = False
+        self.dropped = 0         # frames skipped to keep up with the clock
+        self._clock_start = 0.0
+        self._clock_frame = 0
+
+        self._thread = threading.Thread(target=self._decode_loop, name="playback-decode", daemon=True)
+        self._thread.start()
+
+    # ----------------- Decoder thread -----------------
+    def _decode_loop(self):
+        next_idx = 0
+        while True:
+            with self._cond:
+                while not self._stop and self._seek_to is None and (
+                        self._eof or len(self._buffer) >= self.buffer_size):
+                    self._cond.wait()
+                if self._stop:
+                    break
+                if self._seek_to is not None:
+                    next_idx = self._seek_to
+                    self._seek_to = None
+                    self._cap.set(cv2.CAP_PROP_POS_FRAMES, next_idx)
+                    self._eof = False
+                generation = self._generation
+                compositor = self._compositor
+                display_size = self._display_size
+
+            if self.playing and next_idx < self._due():
+                # Already late: skip the frame without converting it
+                if self._cap.grab():
+                    self.dropped += 1
+                    next_idx += 1
+                    continue
+                ret, frame = False, None
+            else:
+                ret, frame = self._cap.read()
+            if not ret:
+                with self._cond:
+                    if generation == self._generation:
+                        self._eof = True
+                        self._cond.notify_all()
+                continue
+            image = self._prepare(frame, next_idx, compositor, display_size)
+
+            with self._cond:
+                if generation == self._generation:
+                    self._buffer.append((next_idx, image))
+                    self._cond.notify_all()
+            next_idx += 1
+        self._cap.release()
+
+    @staticmethod
+    def _prepare(frame: np.ndarray, idx: int, compositor, display_size: Tuple[int, int]) -> np.ndarray:
+        """Overlay, scale to fit the display (keeping aspect) and convert to RGB."""
+        if compositor is not None and compositor.segment_at(idx) is not None:
+            frame = compositor.composite(frame, idx)
+        h, w = frame.shape[:2]
+        scale = min(display_size[0] / w, display_size[1] / h)
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        if size != (w, h):
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            frame = cv2.resize(frame, size, interpolation=interpolation)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    # ----------------- Control (GUI thread) -----------------
+    def _restart(self, frame_idx: int):
+        """Flush the buffer and decode again from frame_idx. Caller holds the lock."""
+        self._generation += 1
+        self._buffer.clear()
+        self._seek_to = max(0, min(frame_idx, max(0, self.frame_count - 1)))
+        self.position = self._seek_to
+        self._clock_frame = self._seek_to
+        self._clock_start = time.perf_counter()
+        self._cond.notify_all()
+
+    def seek(self, frame_idx: int):
+        with self._cond:
+            self._restart(frame_idx)
+
+    def set_compositor(self, compositor):
+        """Use a new live preview overlay (or None) from the current frame on."""
+        with self._cond:
+            self._compositor = compositor
+            self._restart(self.position)
+
+    def set_display_size(self, width: int, height: int):
+        size = (max(1, width), max(1, height))
+        with self._cond:
+            if size != self._display_size:
+                self._display_size = size
+                self._restart(self.position)
+
+    def play(self):
+        with self._cond:
+            self.playing = True
+            self._clock_frame = self.position
+            self._clock_start = time.perf_counter()
+
+    def pause(self):
+        self.playing = False
+
+    # ----------------- Presentation (GUI thread) -----------------
+    def _due(self) -> int:
+        """Index of the frame that should be on screen now."""
+        return self._clock_frame + int((time.perf_counter() - self._clock_start) * self.fps)
+
+    def next_frame(self) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Return the frame due now as (index, RGB image), or None if the one
+        on screen is still current (or the next isn't decoded yet). Frames
+        whose time has already passed are dropped.
+        """
+        due = self._due()
+        shown = None
+        with self._cond:
+            while self._buffer and self._buffer[0][0] <= due:
+                if shown is not None:
+                    self.dropped += 1
+                shown = self._buffer.popleft()
+            if shown is not None:
+                self._cond.notify_all()
+        if shown is not None:
+            self.position = shown[0]
+        return shown
+
+    def current_frame(self, timeout: float = 2.0) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Wait for the frame at the current position (e.g. after a seek while
+        paused) and return it without advancing the clock.
+        """
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while not self._buffer and not (self._eof and self._seek_to is None):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._buffer[0] if self._buffer else None
+
+    def at_end(self) -> bool:
+        """True once the last frame has been decoded and shown."""
+        with self._cond:
+            return self._eof and self._seek_to is None and not self._buffer
+
+    def close(self):
+        """Stop the decoder thread and release the video."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -2,68 +2,226 @@
 """
 TimelineEditor - Manages black frame segments, markers, split operations, and undo/redo history.
 Stage 9 version: Works with TimelineView for visual editing.
+History stores only what each edit changed, and is bounded in depth and memory.
 """
 
-from typing import List, Tuple
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from core.segment_index import SegmentIndex
+
+Segment = Tuple[int, int]
+
+# Rough per-segment cost of a history entry (tuple + two ints + list slot).
+_SEGMENT_BYTES = 100
+
+
+class Edit:
+    """
+    One undoable step: the segments it removed and the ones it added.
+
+    A `full` edit replaced the whole timeline (set_segments); undoing it
+    resets the index instead of removing segments one by one.
+    """
+
+    def __init__(self, kind: str, removed: List[Segment], added: List[Segment], full: bool = False):
+        self.kind = kind
+        self.removed = removed
+        self.added: Dict[Segment, None] = dict.fromkeys(added)  # ordered set
+        self.full = full
+        self.time = time.monotonic()
+        # Set once the edit has been undone and its redo discarded
+        self.dropped = False
+
+    def fold(self, removed: List[Segment], added: List[Segment]):
+        """Merge a later change into this step."""
+        for segment in removed:
+            if segment in self.added:
+                del self.added[segment]
+            elif not self.full:  # a full edit's removed is the timeline before it
+                self.removed.append(segment)
+        self.added.update(dict.fromkeys(added))
+
+    def nbytes(self) -> int:
+        return (len(self.removed) + len(self.added)) * _SEGMENT_BYTES
 
 
 class TimelineEditor:
-    def __init__(self):
-        # List of black frame segments (start_frame, end_frame)
-        self.segments: List[Tuple[int, int]] = []
+    def __init__(self, max_depth: int = 500, max_history_bytes: int = 64 * 1024 * 1024,
+                 coalesce_seconds: float = 0.0):
+        """
+        Args:
+            max_depth: Most undo steps kept; the oldest are dropped first.
+            max_history_bytes: Approximate memory cap for undo + redo history.
+            coalesce_seconds: Consecutive edits of the same kind (e.g. two
+                markers) made within this many seconds undo as one step.
+        """
+        # Black frame segments (start_frame, end_frame), sorted and non-overlapping
+        self.index = SegmentIndex()
         # Undo/redo stacks for editing history
-        self.undo_stack: List[List[Tuple[int, int]]] = []
-        self.redo_stack: List[List[Tuple[int, int]]] = []
+        self.undo_stack: Deque[Edit] = deque()
+        self.redo_stack: Deque[Edit] = deque()
+        self.max_depth = max_depth
+        self.max_history_bytes = max_history_bytes
+        self.coalesce_seconds = coalesce_seconds
+        self.history_bytes = 0
+        # The set_segments edit that append_segment streams detection results into
+        self._stream_edit: Optional[Edit] = None
         # Currently active editing tool ("Marker Tool", "Split Tool", etc.)
         self.active_tool: str = "Marker Tool"
 
-    def set_segments(self, segments: List[Tuple[int, int]]):
-        """Set detected black frame segments (push previous state to undo)."""
-        self.undo_stack.append(self.segments.copy())
-        self.segments = segments.copy()
+    @property
+    def segments(self) -> List[Segment]:
+        return self.index.to_list()
+
+    # ----------------- History -----------------
+    def _record(self, kind: str, removed: List[Segment], added: List[Segment],
+                full: bool = False) -> Edit:
+        """Push an edit (or fold it into the previous one) and clear redo."""
+        for edit in self.redo_stack:
+            self.history_bytes -= edit.nbytes()
+            edit.dropped = True
         self.redo_stack.clear()
+        last = self.undo_stack[-1] if self.undo_stack else None
+        if (not full and last is not None and last.kind == kind and not last.full
+                and time.monotonic() - last.time <= self.coalesce_seconds):
+            self.history_bytes -= last.nbytes()
+            last.fold(removed, added)
+            last.time = time.monotonic()
+            self.history_bytes += last.nbytes()
+            edit = last
+        else:
+            edit = Edit(kind, removed, added, full)
+            self.undo_stack.append(edit)
+            self.history_bytes += edit.nbytes()
+        self._trim()
+        return edit
+
+    def _trim(self):
+        """Drop the oldest undo steps beyond the depth or memory cap."""
+        while len(self.undo_stack) > 1 and (
+                len(self.undo_stack) > self.max_depth or self.history_bytes > self.max_history_bytes):
+            self.history_bytes -= self.undo_stack.popleft().nbytes()
 
-    def get_segments(self) -> List[Tuple[int, int]]:
-        """Return current black frame segments."""
+    def _apply(self, removed: List[Segment], added: List[Segment],
+               full: bool) -> Tuple[List[Segment], List[Segment]]:
+        """
+        Remove `removed` and insert `added`, returning what actually changed
+        as (removed, added). Segments no longer stored are skipped and
+        inserts merge with whatever they overlap, so the index stays valid
+        even if something changed under the edit (e.g. streamed detection
+        results landing next to it).
+        """
+        if full:
+            before = self.segments
+            self.index.reset(added)
+            return before, self.segments
+        gone = [segment for segment in removed if self.index.remove(segment)]
+        stored: List[Segment] = []
+        for segment in added:
+            merged, segment = self.index.insert(segment)
+            for other in merged:
+                if other in stored:
+                    stored.remove(other)
+                else:
+                    gone.append(other)
+            stored.append(segment)
+        unchanged = set(gone) & set(stored)
+        return ([segment for segment in gone if segment not in unchanged],
+                [segment for segment in stored if segment not in unchanged])
+
+    def _replay(self, edit: Edit, undo: bool):
+        """
+        Undo or redo an edit, then store what actually changed as its delta,
+        so the opposite step exactly reverses this one.
+        """
+        self.history_bytes -= edit.nbytes()
+        if undo:
+            added, removed = self._apply(list(edit.added), edit.removed, edit.full)
+        else:
+            removed, added = self._apply(edit.removed, list(edit.added), edit.full)
+        edit.removed, edit.added = removed, dict.fromkeys(added)
+        self.history_bytes += edit.nbytes()
+
+    # ----------------- Edits -----------------
+    def set_segments(self, segments: List[Segment]):
+        """Set detected black frame segments (push previous state to undo)."""
+        previous = self.segments
+        self.index.reset(segments)
+        self._stream_edit = self._record("set", previous, self.segments, full=True)
+
+    def get_segments(self) -> List[Segment]:
+        """Return current black frame segments, ordered and non-overlapping."""
         return self.segments
 
+    def segment_at(self, frame: int) -> Optional[Segment]:
+        """Return the segment containing `frame`, or None."""
+        return self.index.segment_at(frame)
+
+    def segments_between(self, first: int, last: int) -> List[Segment]:
+        """Return the segments overlapping frames first..last."""
+        return self.index.overlapping(first, last)
+
+    def append_segment(self, segment: Segment):
+        """
+        Append a segment without recording an undo step.
+        Used to stream detection results in after set_segments([]) has
+        recorded the detection as a single undoable action: the segment is
+        folded into that action, even if the user has made edits since, so
+        undoing those edits leaves the streamed segments alone. If the
+        detection has been undone, the segment only comes back with redo.
+        """
+        edit = self._stream_edit
+        if edit is not None and edit.dropped:
+            return
+        if edit is not None and edit in self.redo_stack:
+            self.history_bytes -= edit.nbytes()
+            edit.fold([], [(int(segment[0]), int(segment[1]))])
+            self.history_bytes += edit.nbytes()
+            return
+        removed, stored = self.index.insert(segment)
+        if edit is not None and edit in self.undo_stack:
+            self.history_bytes -= edit.nbytes()
+            edit.fold(removed, [stored])
+            self.history_bytes += edit.nbytes()
+
     def add_marker(self, frame: int):
         """
         Add a new marker segment at a specific frame.
-        Here we just add a small segment [frame, frame+5] for demonstration.
+        Here we just add a small segment [frame, frame+5] for demonstration;
+        it is merged with any segment it overlaps.
         """
-        self.undo_stack.append(self.segments.copy())
-        self.segments.append((frame, frame + 5))
-        self.redo_stack.clear()
+        removed, stored = self.index.insert((frame, frame + 5))
+        if removed != [stored]:
+            self._record("marker", removed, [stored])
 
     def split_segment(self, frame: int):
         """
-        Split an existing segment at a given frame, if the frame lies inside it.
+        Split an existing segment at a given frame, if the frame lies inside it:
+        (start, end) becomes (start, frame - 1) and (frame, end).
         """
-        self.undo_stack.append(self.segments.copy())
-        for seg in self.segments:
-            start, end = seg
-            if start < frame < end:
-                self.segments.remove(seg)
-                self.segments.append((start, frame))
-                self.segments.append((frame, end))
-                break
-        self.redo_stack.clear()
+        result = self.index.split(frame)
+        if result is not None:
+            original, left, right = result
+            self._record("split", [original], [left, right])
 
     def undo(self):
         """Undo the last action."""
         if not self.undo_stack:
             return None
-        self.redo_stack.append(self.segments.copy())
-        self.segments = self.undo_stack.pop()
+        edit = self.undo_stack.pop()
+        self._replay(edit, undo=True)
+        self.redo_stack.append(edit)
         return self.segments
 
     def redo(self):
         """Redo the last undone action."""
         if not self.redo_stack:
             return None
-        self.undo_stack.append(self.segments.copy())
-        self.segments = self.redo_stack.pop()
+        edit = self.redo_stack.pop()
+        self._replay(edit, undo=False)
+        self.undo_stack.append(edit)
         return self.segments
 
     def set_tool(self, tool: str):
@@ -2,13 +2,23 @@
 """
 TimelineView widget for displaying black frame segments visually.
 Supports interaction with Marker, Split, and Selection tools.
+Segments are bucketed per pixel column and the rendered strip is cached,
+so repaints stay cheap with tens of thousands of segments. The mouse
+wheel zooms (down to single frames) and Shift+wheel or a middle-button
+drag pans.
 """
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+import numpy as np
 from PyQt6.QtWidgets import QWidget
-from PyQt6.QtGui import QPainter, QColor, QPen
+from PyQt6.QtGui import QPainter, QColor, QPen, QPixmap
 from PyQt6.QtCore import Qt, pyqtSignal
 
+ZOOM_STEP = 1.25
+MIN_PIXELS_PER_FRAME = 1 / 20000  # widest view: the whole video
+MAX_PIXELS_PER_FRAME = 24         # narrowest view: frames are clearly separate
+
 
 class TimelineView(QWidget):
     segmentClicked = pyqtSignal(int)  # emits clicked frame index
@@ -17,34 +27,146 @@ class TimelineView(QWidget):
         super().__init__()
         self.segments: List[Tuple[int, int]] = []
         self.video_length = 1  # total number of frames
+        self.playhead = None   # frame on screen
+        self.view_start = 0.0  # first visible frame
+        self.view_frames = 1.0 # number of visible frames
         self.setMinimumHeight(50)
 
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._ends = np.zeros(0, dtype=np.int64)
+        self._strip: Optional[QPixmap] = None
+        self._strip_key = None
+        self._pan_anchor = None
+
     def set_segments(self, segments: List[Tuple[int, int]], total_frames: int):
-        """Set segments and total video length for display."""
+        """
+        Set segments and total video length for display. Segments must be
+        ordered and non-overlapping, as TimelineEditor hands them out.
+        """
         self.segments = segments
-        self.video_length = max(total_frames, 1)
+        total_frames = max(total_frames, 1)
+        if total_frames != self.video_length:
+            self.video_length = total_frames
+            self.view_start, self.view_frames = 0.0, float(total_frames)
+
+        bounds = np.array(segments, dtype=np.int64).reshape(-1, 2)
+        self._starts = bounds[:, 0]
+        self._ends = bounds[:, 1]  # increasing too, since segments don't overlap
+        self._strip = None
         self.update()
 
-    def paintEvent(self, event):
-        """Draw timeline and black segments."""
-        painter = QPainter(self)
-        painter.fillRect(self.rect(), QColor(220, 220, 220))  # light gray background
+    def set_playhead(self, frame: int):
+        """Mark the frame currently shown in the preview."""
+        if frame != self.playhead:
+            self.playhead = frame
+            self.update()
+
+    # ----------------- Coordinates -----------------
+    def frame_at(self, x: float) -> int:
+        frame = int(self.view_start + (x / max(1, self.width())) * self.view_frames)
+        return max(0, min(frame, self.video_length - 1))
+
+    def x_at(self, frame: float) -> float:
+        return (frame - self.view_start) / self.view_frames * self.width()
+
+    def set_view(self, start: float, frames: float):
+        """Show `frames` frames starting at `start`, clamped to the video."""
+        width = max(1, self.width())
+        frames = min(max(frames, width / MAX_PIXELS_PER_FRAME), float(self.video_length),
+                     width / MIN_PIXELS_PER_FRAME)
+        start = max(0.0, min(start, self.video_length - frames))
+        if (start, frames) != (self.view_start, self.view_frames):
+            self.view_start, self.view_frames = start, frames
+            self.update()
 
-        width = self.width()
-        height = self.height()
+    # ----------------- Rendering -----------------
+    def covered_columns(self, width: int) -> np.ndarray:
+        """
+        Boolean mask of pixel columns that contain at least one black frame,
+        for the visible range only. Segments are located with binary search
+        and rasterized in one vectorized pass.
+        """
+        view_end = self.view_start + self.view_frames
+        first = int(np.searchsorted(self._ends, self.view_start, side="left"))
+        last = int(np.searchsorted(self._starts, view_end, side="left"))
+        coverage = np.zeros(width + 1, dtype=np.int32)
+        if last <= first:
+            return coverage[:width] > 0
+        scale = width / self.view_frames
+        x1 = np.floor((self._starts[first:last] - self.view_start) * scale).astype(np.int64)
+        # Inclusive end frame; every visible segment gets at least one column
+        x2 = np.ceil((self._ends[first:last] + 1 - self.view_start) * scale).astype(np.int64)
+        x1 = np.clip(x1, 0, width - 1)
+        x2 = np.clip(np.maximum(x2, x1 + 1), 0, width)
+        np.add.at(coverage, x1, 1)
+        np.add.at(coverage, x2, -1)
+        return np.cumsum(coverage[:width]) > 0
 
-        pen = QPen(QColor(0, 0, 0))
-        painter.setPen(pen)
+    def _render_strip(self, width: int, height: int) -> QPixmap:
+        strip = QPixmap(width, height)
+        strip.fill(QColor(220, 220, 220))  # light gray background
+        painter = QPainter(strip)
+        painter.setPen(Qt.PenStyle.NoPen)
         painter.setBrush(QColor(50, 50, 50))  # black segments
 
-        for start, end in self.segments:
-            x1 = int((start / self.video_length) * width)
-            x2 = int((end / self.video_length) * width)
-            painter.drawRect(x1, 0, x2 - x1, height)
+        covered = self.covered_columns(width).astype(np.int8)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], covered, [0]))))
+        for x1, x2 in zip(edges[0::2], edges[1::2]):
+            painter.drawRect(int(x1), 0, int(x2 - x1), height)
 
+        # Frame ticks once single frames are wide enough to aim at
+        if width / self.view_frames >= 6:
+            painter.setPen(QPen(QColor(160, 160, 160)))
+            for frame in range(int(self.view_start), int(self.view_start + self.view_frames) + 1):
+                x = int(self.x_at(frame))
+                painter.drawLine(x, height - 4, x, height)
+        painter.end()
+        return strip
+
+    def paintEvent(self, event):
+        """Draw the cached segment strip, then the playhead on top."""
+        width, height = self.width(), self.height()
+        key = (width, height, self.view_start, self.view_frames)
+        if self._strip is None or self._strip_key != key:
+            self._strip = self._render_strip(max(1, width), max(1, height))
+            self._strip_key = key
+
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._strip)
+        if self.playhead is not None:
+            painter.setPen(QPen(QColor(220, 40, 40), 2))
+            x = int(self.x_at(self.playhead + 0.5))
+            painter.drawLine(x, 0, x, height)
+
+    # ----------------- Interaction -----------------
     def mousePressEvent(self, event):
-        """Emit clicked frame based on position."""
+        """Emit clicked frame based on position; middle button starts a pan."""
         if event.button() == Qt.MouseButton.LeftButton:
-            click_x = event.position().x()
-            frame = int((click_x / self.width()) * self.video_length)
-            self.segmentClicked.emit(frame)
+            self.segmentClicked.emit(self.frame_at(event.position().x()))
+        elif event.button() == Qt.MouseButton.MiddleButton:
+            self._pan_anchor = (event.position().x(), self.view_start)
+
+    def mouseMoveEvent(self, event):
+        if self._pan_anchor is not None:
+            anchor_x, anchor_start = self._pan_anchor
+            shift = (anchor_x - event.position().x()) / max(1, self.width()) * self.view_frames
+            self.set_view(anchor_start + shift, self.view_frames)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.MiddleButton:
+            self._pan_anchor = None
+
+    def wheelEvent(self, event):
+        """Wheel zooms around the cursor; Shift+wheel (or a horizontal wheel) pans."""
+        delta = event.angleDelta()
+        steps = (delta.y() or delta.x()) / 120
+        if not steps:
+            return
+        if delta.x() or event.modifiers() & Qt.KeyboardModifier.ShiftModifier:
+            self.set_view(self.view_start - steps * self.view_frames / 10, self.view_frames)
+        else:
+            x = event.position().x()
+            anchor = self.view_start + x / max(1, self.width()) * self.view_frames
+            frames = self.view_frames / (ZOOM_STEP ** steps)
+            self.set_view(anchor - x / max(1, self.width()) * frames, frames)
+        event.accept()
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("cv2")
+
+from benchmarks.synthetic import write_test_video
+from core.video_processor import detect_black_frames
+
+
+@pytest.fixture
+def video(tmp_path):
+    def make(segments, frames=120):
+        path = str(tmp_path / "video.avi")
+        write_test_video(path, 64, 48, frames, 25, segments)
+        return path
+    return make
+
+
+def test_sampled_scan_is_exact_when_segments_and_gaps_are_long(video):
+    segments = [(3, 12), (20, 40), (47, 60), (100, 119)]
+    path = video(segments)
+    assert detect_black_frames(path) == segments
+    for step in (2, 5, 7):
+        assert detect_black_frames(path, sample_step=step) == segments
+        assert detect_black_frames(path, sample_step=step, seek=True) == segments
+
+
+def test_sampled_scan_merges_across_a_gap_shorter_than_the_step(video):
+    path = video([(20, 40), (45, 46)])
+    assert detect_black_frames(path) == [(20, 40), (45, 46)]
+    assert detect_black_frames(path, sample_step=5) == [(20, 46)]
+    assert detect_black_frames(path, sample_step=4) == [(20, 40)]  # (45, 46) is too short
+    assert detect_black_frames(path, sample_step=2) == [(20, 40), (45, 46)]
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("cv2")
+
+from core.detection_cache import DetectionCache
+from core.luma_analysis import LumaAnalyzer
+from core.video_processor import BLACK_THRESHOLD
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DetectionCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"not really a video" * 100)
+    return str(path)
+
+
+def test_defaults_and_explicit_defaults_share_an_entry(cache, video):
+    cache.put(video, [(1, 2)])
+    assert cache.get(video, threshold=BLACK_THRESHOLD, sample_step=1) == [(1, 2)]
+    assert cache.get(video, workers=4) == [(1, 2)]
+    assert cache.get(video, threshold=BLACK_THRESHOLD + 1) is None
+
+
+def test_parallel_analyzer_results_are_cached_apart_from_serial(cache, video):
+    analyzer = LumaAnalyzer()
+    cache.put(video, [(1, 2)], analyzer=analyzer)
+    assert cache.get(video, analyzer=LumaAnalyzer(), workers=1, chunk_frames=500) == [(1, 2)]
+    assert cache.get(video, analyzer=analyzer, workers=4) is None
+    cache.put(video, [(1, 3)], analyzer=analyzer, workers=4)
+    assert cache.get(video, analyzer=analyzer, workers=4) == [(1, 3)]
+    assert cache.get(video, analyzer=analyzer) == [(1, 2)]
+
+
+def test_parallel_scans_ignore_sample_step(cache, video):
+    cache.put(video, [(1, 2)], workers=4, sample_step=8)
+    assert cache.get(video) == [(1, 2)]
+    assert cache.get(video, workers=2, sample_step=3) == [(1, 2)]
+    assert cache.get(video, sample_step=8) is None
@@ -0,0 +1,65 @@
+import os
+import re
+import shutil
+import time
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("PyQt6.QtWidgets")
+if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+    pytest.skip("needs ffmpeg and ffprobe", allow_module_level=True)
+
+from PyQt6.QtWidgets import QApplication
+
+from benchmarks.synthetic import write_test_video
+from core.incremental_render import RenderStateStore
+from core.meme_disk_cache import MemeDiskCache
+from gui.job_manager import DONE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEGMENTS = [(30, 50), (150, 170), (270, 290)]
+
+
+@pytest.fixture
+def window(tmp_path, monkeypatch):
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.chdir(ROOT)  # the meme library is ./memes
+    from gui.main_window import MemeFillerApp
+    app = QApplication.instance() or QApplication([])
+    win = MemeFillerApp()
+    win.render_states = RenderStateStore(str(tmp_path / "renders"))
+    win.disk_cache = MemeDiskCache(str(tmp_path / "memes"))
+    win.selected_categories = set(win.meme_library)
+    yield win
+    win.jobs.shutdown()
+    win.close()
+    app.processEvents()
+
+
+def export(win, output_path):
+    win.start_export(output_path, win.memes_for(win.timeline.get_segments()))
+    deadline = time.monotonic() + 120
+    while win.jobs.active("export") and time.monotonic() < deadline:
+        QApplication.processEvents()
+        time.sleep(0.01)
+    job = win.jobs.jobs()[-1]
+    assert job.state == DONE, job.error
+    return job.result
+
+
+def test_one_segment_edit_rerenders_only_its_window(window, tmp_path):
+    video = str(tmp_path / "in.mp4")
+    output = str(tmp_path / "out.mp4")
+    write_test_video(video, 160, 120, 360, 30, SEGMENTS)
+    window.video_path = video
+    window.timeline.set_segments(SEGMENTS)
+    export(window, output)
+
+    window.timeline.split_segment(160)
+    message = export(window, output)
+    match = re.search(r"\((\d+) of (\d+) frames re-rendered\)", message)
+    assert match, message
+    rendered, total = int(match.group(1)), int(match.group(2))
+    assert 0 < rendered < total
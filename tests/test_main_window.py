@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("PyQt6.QtWidgets")
+
+from PyQt6.QtWidgets import QApplication
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def window(tmp_path, monkeypatch):
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.chdir(ROOT)  # the meme library is ./memes
+    from gui.main_window import MemeFillerApp
+    app = QApplication.instance() or QApplication([])
+    win = MemeFillerApp()
+    yield win
+    win.jobs.shutdown()
+    win.close()
+    app.processEvents()
+
+
+def test_selection_tool_clicks_only_navigate(window):
+    window.timeline.set_segments([(10, 20)])
+    window.tool_picker.setCurrentText("Selection Tool")
+    window.on_timeline_click(100)
+    window.on_timeline_click(15)
+    assert window.timeline.get_segments() == [(10, 20)]
+    assert len(window.timeline.undo_stack) == 1
+
+
+def test_marker_and_split_tools_edit_where_clicked(window):
+    window.timeline.set_segments([(10, 20)])
+    window.tool_picker.setCurrentText("Marker Tool")
+    window.on_timeline_click(100)
+    window.tool_picker.setCurrentText("Split Tool")
+    window.on_timeline_click(15)
+    assert window.timeline.get_segments() == [(10, 14), (15, 20), (100, 105)]
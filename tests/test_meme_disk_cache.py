@@ -0,0 +1,35 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.meme_disk_cache import MemeDiskCache
+
+
+@pytest.fixture
+def meme(tmp_path):
+    path = tmp_path / "meme.png"
+    path.write_bytes(b"png")
+    return str(path)
+
+
+def test_size_is_measured_on_first_put_not_on_open(tmp_path, meme, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    MemeDiskCache(cache_dir).put(meme, (8, 8), 2, 0, np.zeros((8, 8, 3), np.uint8))
+
+    scans = []
+    monkeypatch.setattr(MemeDiskCache, "_scan", lambda self: scans.append(1) or ([], 384))
+    cache = MemeDiskCache(cache_dir)
+    assert not scans and cache.stats()["bytes"] is None
+    assert cache.get(meme, (8, 8), 2, 0).shape == (8, 8, 3)
+    cache.put(meme, (8, 8), 2, 1, np.zeros((8, 8, 3), np.uint8))
+    assert len(scans) == 1 and cache.stats()["bytes"] == 384
+
+
+def test_first_put_evicts_down_to_a_lowered_cap(tmp_path, meme):
+    cache_dir = str(tmp_path / "cache")
+    big = MemeDiskCache(cache_dir)
+    for i in range(4):
+        big.put(meme, (16, 16), 2, i, np.zeros((16, 16, 3), np.uint8))
+    small = MemeDiskCache(cache_dir, max_bytes=2000)
+    small.put(meme, (16, 16), 2, 4, np.zeros((16, 16, 3), np.uint8))
+    assert small.stats()["bytes"] <= 2000
@@ -0,0 +1,46 @@
+from collections import Counter
+
+from utils.meme_sampler import MemeSampler
+
+LIBRARY = {
+    "funny": [f"funny_{i}.jpg" for i in range(20)],
+    "gaming": [f"gaming_{i}.jpg" for i in range(20)],
+}
+
+
+def test_category_weights_shape_the_distribution():
+    sampler = MemeSampler(LIBRARY, category_weights={"funny": 3.0, "gaming": 1.0},
+                          no_repeat=0, seed=1)
+    counts = Counter(meme.split("_")[0] for meme in sampler.sample(LIBRARY, 20000))
+    assert abs(counts["funny"] / 20000 - 0.75) < 0.02
+
+
+def test_zero_weights_exclude_categories_and_memes():
+    sampler = MemeSampler(LIBRARY, category_weights={"gaming": 0},
+                          meme_weights={"funny_0.jpg": 0}, seed=1)
+    drawn = set(sampler.sample(LIBRARY, 500))
+    assert drawn == set(LIBRARY["funny"][1:])
+
+
+def test_same_seed_gives_the_same_sequence():
+    first = MemeSampler(LIBRARY, seed=42).sample({"funny", "gaming"}, 100)
+    second = MemeSampler(LIBRARY, seed=42).sample({"funny", "gaming"}, 100)
+    assert first == second
+    sampler = MemeSampler(LIBRARY, seed=42)
+    sampler.sample({"funny"}, 10)
+    sampler.seed(42)
+    assert sampler.sample({"funny", "gaming"}, 100) == first
+
+
+def test_no_meme_repeats_inside_the_window():
+    sampler = MemeSampler(LIBRARY, no_repeat=16, seed=3)
+    drawn = sampler.sample({"funny", "gaming"}, 2000)
+    for i, meme in enumerate(drawn):
+        assert meme not in drawn[max(0, i - 16):i]
+
+
+def test_window_shrinks_to_a_small_pool():
+    sampler = MemeSampler({"tiny": ["a.jpg", "b.jpg", "c.jpg"]}, no_repeat=16, seed=5)
+    drawn = sampler.sample({"tiny"}, 300)
+    for i in range(2, len(drawn)):
+        assert drawn[i] not in drawn[i - 2:i]
@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from core.instrumentation import ProcessingStats
+from core.render_pipeline import RenderPipeline
+
+
+class FakeCapture:
+    def __init__(self, frames):
+        self.frames = frames
+        self.pos = 0
+
+    def read(self, buffer=None):
+        if self.pos >= self.frames:
+            return False, None
+        self.pos += 1
+        return True, np.full((4, 4, 3), self.pos, dtype=np.uint8)
+
+
+class ListWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(int(frame[0, 0, 0]))
+
+
+class Identity:
+    def composite(self, frame, frame_idx):
+        return frame
+
+
+def test_untimed_pipeline_writes_frames_in_order():
+    writer = ListWriter()
+    pipeline = RenderPipeline(FakeCapture(30), writer, Identity())
+    assert pipeline.run() == 30
+    assert writer.frames == list(range(1, 31))
+    assert list(pipeline.stats()) == ["total"]
+
+
+def test_timed_pipeline_reports_stages():
+    stats = ProcessingStats()
+    pipeline = RenderPipeline(FakeCapture(30), ListWriter(), Identity(), stats=stats)
+    pipeline.run()
+    assert pipeline.stats()["encode"]["frames"] == 30
+    assert stats.snapshot()["counters"]["frames"] == 30
@@ -0,0 +1,18 @@
+from core.segment_index import SegmentIndex
+
+
+def test_insert_merges_overlaps_and_split_keeps_order():
+    index = SegmentIndex([(50, 60), (10, 20)])
+    assert index.insert((15, 30)) == ([(10, 20)], (10, 30))
+    assert index.split(25) == ((10, 30), (10, 24), (25, 30))
+    assert index.to_list() == [(10, 24), (25, 30), (50, 60)]
+    assert index.segment_at(26) == (25, 30)
+
+
+def test_to_list_is_a_snapshot():
+    index = SegmentIndex([(10, 20)])
+    segments = index.to_list()
+    segments.append((0, 5))
+    index.insert((30, 40))
+    assert segments == [(10, 20), (0, 5)]
+    assert index.to_list() == [(10, 20), (30, 40)]
@@ -0,0 +1,36 @@
+import os
+import shutil
+
+import pytest
+
+from core.smart_render import plan_smart_render
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+needs_ffmpeg = pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+                                  reason="needs ffmpeg and ffprobe")
+
+
+def test_plan_widens_segments_to_keyframes():
+    plan = plan_smart_render([(35, 40), (55, 60)], [0, 30, 50, 90], 120)
+    assert plan == [(0, 30, False), (30, 90, True), (90, 120, False)]
+
+
+@needs_ffmpeg
+def test_smart_render_keeps_source_audio(tmp_path):
+    pytest.importorskip("cv2")
+    from benchmarks.synthetic import write_test_video
+    from core import ffmpeg_tools
+    from core.smart_render import smart_insert_memes
+
+    silent = str(tmp_path / "silent.mp4")
+    video = str(tmp_path / "in.mp4")
+    output = str(tmp_path / "out.mp4")
+    write_test_video(silent, 160, 120, 90, 30, [(30, 50)])
+    ffmpeg_tools.run([
+        ffmpeg_tools.find_binary("ffmpeg"), "-y", "-v", "error", "-i", silent,
+        "-f", "lavfi", "-i", "sine=frequency=440:duration=3",
+        "-map", "0:v:0", "-map", "1:a:0", "-c:v", "libx264", "-g", "15", "-c:a", "aac",
+        "-shortest", video,
+    ])
+    smart_insert_memes(video, output, [(30, 50)], [os.path.join(ROOT, "memes", "funny", "funny_meme_1.jpg")])
+    assert ffmpeg_tools.probe_audio(output) == "aac"
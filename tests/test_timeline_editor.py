@@ -0,0 +1,131 @@
+import pytest
+
+from gui import timeline_editor
+from gui.timeline_editor import TimelineEditor
+
+
+def start_detection(editor, segments):
+    editor.set_segments([])
+    for segment in segments:
+        editor.append_segment(segment)
+
+
+def test_streamed_segments_undo_as_one_step():
+    editor = TimelineEditor()
+    editor.set_segments([(1, 2)])
+    start_detection(editor, [(10, 20), (200, 210)])
+    assert editor.undo() == [(1, 2)]
+    assert editor.redo() == [(10, 20), (200, 210)]
+
+
+def test_undo_marker_placed_during_detection_keeps_later_segments():
+    editor = TimelineEditor()
+    start_detection(editor, [(10, 20)])
+    editor.add_marker(100)
+    editor.append_segment((200, 210))
+    editor.append_segment((300, 310))
+
+    assert editor.undo() == [(10, 20), (200, 210), (300, 310)]
+    assert editor.redo() == [(10, 20), (100, 105), (200, 210), (300, 310)]
+    editor.undo()
+    assert editor.undo() == []
+    assert editor.redo() == [(10, 20), (200, 210), (300, 310)]
+
+
+def test_segments_streamed_after_undoing_detection_return_with_redo():
+    editor = TimelineEditor()
+    start_detection(editor, [(10, 20)])
+    assert editor.undo() == []
+    editor.append_segment((200, 210))
+    assert editor.get_segments() == []
+    assert editor.redo() == [(10, 20), (200, 210)]
+
+
+def test_detection_undone_and_overwritten_stops_streaming():
+    editor = TimelineEditor()
+    start_detection(editor, [(10, 20)])
+    editor.undo()
+    editor.add_marker(100)
+    editor.append_segment((200, 210))
+    assert editor.get_segments() == [(100, 105)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(timeline_editor.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_depth_cap_drops_oldest_steps(clock):
+    editor = TimelineEditor(max_depth=3)
+    for frame in range(0, 100, 20):
+        clock[0] += 1
+        editor.add_marker(frame)
+    assert len(editor.undo_stack) == 3
+    while editor.undo() is not None:
+        pass
+    assert editor.get_segments() == [(0, 5), (20, 25)]
+
+
+def test_memory_cap_keeps_at_least_one_step():
+    editor = TimelineEditor(max_history_bytes=1)
+    editor.set_segments([(i * 10, i * 10 + 5) for i in range(100)])
+    editor.set_segments([])
+    assert len(editor.undo_stack) == 1
+    assert editor.history_bytes == editor.undo_stack[0].nbytes()
+
+
+def test_edits_of_one_kind_within_coalesce_window_undo_together(clock):
+    editor = TimelineEditor(coalesce_seconds=0.3)
+    editor.add_marker(10)
+    clock[0] += 0.1
+    editor.add_marker(50)
+    clock[0] += 1.0
+    editor.add_marker(90)
+    assert len(editor.undo_stack) == 2
+    assert editor.undo() == [(10, 15), (50, 55)]
+    assert editor.undo() == []
+
+
+def test_new_edit_clears_redo(clock):
+    editor = TimelineEditor()
+    editor.add_marker(10)
+    editor.undo()
+    clock[0] += 1
+    editor.add_marker(50)
+    assert not editor.redo_stack
+    assert editor.redo() is None
+    assert editor.history_bytes == sum(edit.nbytes() for edit in editor.undo_stack)
+
+
+def test_undo_and_redo_keep_the_index_valid_when_segments_moved_underneath():
+    editor = TimelineEditor()
+    editor.add_marker(10)
+    editor.undo()
+    editor.index.insert((12, 30))  # something outside the history took the space
+    assert editor.redo() == [(10, 30)]
+    assert editor.undo() == [(12, 30)]
+
+
+def test_undo_marker_merged_with_a_later_streamed_segment():
+    editor = TimelineEditor()
+    start_detection(editor, [(10, 20)])
+    editor.add_marker(18)
+    editor.append_segment((22, 30))
+    assert editor.undo() == [(10, 30)]  # the streamed frames stay black
+    assert editor.undo() == []
+    assert editor.redo() == [(10, 30)]
+    assert editor.redo() == [(10, 30)]
+
+
+def test_redo_marker_overlapping_a_segment_streamed_after_its_undo():
+    editor = TimelineEditor()
+    start_detection(editor, [])
+    editor.add_marker(100)
+    editor.undo()
+    editor.append_segment((103, 110))
+    assert editor.redo() == [(100, 110)]
+    assert editor.undo() == [(103, 110)]
+    assert editor.undo() == []
+    assert editor.redo() == [(103, 110)]
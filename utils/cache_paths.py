@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Cache Paths for Automatic Meme Filler App.
+Every per-user cache (detections, prepared memes, render states, meme
+manifests) lives in its own subdirectory of one base directory:
+$XDG_CACHE_HOME/automatic-meme-filler, or ~/.cache/automatic-meme-filler.
+"""
+
+import os
+
+
+def user_cache_dir(name: str) -> str:
+    """Return the per-user cache subdirectory `name` (not created here)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "automatic-meme-filler", name)
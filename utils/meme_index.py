@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Meme Index
+Keeps a persistent manifest of the meme library with per-file metadata
+(dimensions, type, frame count, duration, size, mtime). Refreshing it only
+stats each file with os.scandir and re-probes the ones whose size or mtime
+changed, so a warm start is cheap even for very large libraries.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import cv2
+
+from utils.cache_paths import user_cache_dir
+
+MEME_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".mp4")
+ANIMATED_EXTENSIONS = (".gif", ".mp4")
+_MANIFEST_VERSION = 1
+
+
+def default_manifest_path(meme_folder: str) -> str:
+    """Per-user manifest location for a meme folder."""
+    key = hashlib.sha1(os.path.abspath(meme_folder).encode()).hexdigest()[:16]
+    return os.path.join(user_cache_dir("manifests"), f"{key}.json")
+
+
+def probe_meme(path: str) -> Dict:
+    """Read a meme's dimensions, type, frame count and duration."""
+    if path.lower().endswith(ANIMATED_EXTENSIONS):
+        cap = cv2.VideoCapture(path)
+        try:
+            if not cap.isOpened():
+                return {"type": "animated", "width": 0, "height": 0, "frames": 0, "duration": 0.0}
+            frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            return {
+                "type": "animated",
+                "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "frames": frames,
+                "duration": round(frames / fps, 3) if fps > 0 else 0.0,
+            }
+        finally:
+            cap.release()
+    image = cv2.imread(path)
+    height, width = image.shape[:2] if image is not None else (0, 0)
+    return {"type": "image", "width": width, "height": height, "frames": 1, "duration": 0.0}
+
+
+class MemeIndex:
+    """
+    Incrementally maintained index of a meme folder.
+
+    Layout is the same as for load_meme_library: one sub-folder per
+    category. Entries are keyed by path and hold the category, file size,
+    mtime_ns and probed metadata.
+    """
+
+    def __init__(self, meme_folder: str, manifest_path: Optional[str] = None):
+        self.meme_folder = meme_folder
+        self.manifest_path = manifest_path or default_manifest_path(meme_folder)
+        self.entries: Dict[str, Dict] = {}
+        self._load()
+
+    # ----------------- Persistence -----------------
+    def _load(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == _MANIFEST_VERSION:
+            self.entries = data.get("entries", {})
+
+    def save(self):
+        """Write the manifest atomically (best effort: errors are ignored)."""
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": _MANIFEST_VERSION, "entries": self.entries}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            pass
+
+    # ----------------- Refresh -----------------
+    def refresh(self) -> Dict[str, int]:
+        """
+        Bring the index up to date with the folder.
+
+        Returns:
+            Counts of added, updated, removed and unchanged files.
+        """
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        if not os.path.exists(self.meme_folder):
+            os.makedirs(self.meme_folder, exist_ok=True)
+
+        seen = set()
+        with os.scandir(self.meme_folder) as categories:
+            for category in categories:
+                if not category.is_dir():
+                    continue
+                with os.scandir(category.path) as files:
+                    for entry in files:
+                        if not entry.name.lower().endswith(MEME_EXTENSIONS) or not entry.is_file():
+                            continue
+                        seen.add(entry.path)
+                        stat = entry.stat()
+                        old = self.entries.get(entry.path)
+                        if (old is not None and old["size"] == stat.st_size
+                                and old["mtime_ns"] == stat.st_mtime_ns):
+                            counts["unchanged"] += 1
+                            continue
+                        record = {"category": category.name, "size": stat.st_size,
+                                  "mtime_ns": stat.st_mtime_ns}
+                        record.update(probe_meme(entry.path))
+                        self.entries[entry.path] = record
+                        counts["updated" if old is not None else "added"] += 1
+
+        for path in [p for p in self.entries if p not in seen]:
+            del self.entries[path]
+            counts["removed"] += 1
+
+        if counts["added"] or counts["updated"] or counts["removed"]:
+            self.save()
+        return counts
+
+    # ----------------- Queries -----------------
+    def categories(self) -> List[str]:
+        return sorted({entry["category"] for entry in self.entries.values()})
+
+    def library(self) -> Dict[str, List[str]]:
+        """Return {category: [paths]}, the same shape as load_meme_library."""
+        library: Dict[str, List[str]] = {}
+        for path in sorted(self.entries):
+            library.setdefault(self.entries[path]["category"], []).append(path)
+        return library
+
+    def query(
+        self,
+        categories: Optional[List[str]] = None,
+        meme_type: Optional[str] = None,
+        min_width: int = 0,
+        min_height: int = 0,
+        max_duration: Optional[float] = None
+    ) -> List[str]:
+        """
+        Return paths of memes matching every given filter.
+
+        Args:
+            categories: Only these categories (all if None).
+            meme_type: "image" or "animated".
+            min_width: Minimum width in pixels.
+            min_height: Minimum height in pixels.
+            max_duration: Longest allowed duration in seconds (animated memes).
+        """
+        wanted = set(categories) if categories is not None else None
+        result = []
+        for path in sorted(self.entries):
+            entry = self.entries[path]
+            if wanted is not None and entry["category"] not in wanted:
+                continue
+            if meme_type is not None and entry["type"] != meme_type:
+                continue
+            if entry["width"] < min_width or entry["height"] < min_height:
+                continue
+            if max_duration is not None and entry["duration"] > max_duration:
+                continue
+            result.append(path)
+        return result
+
+    def metadata(self, path: str) -> Optional[Dict]:
+        """Return the manifest record of one meme."""
+        return self.entries.get(path)
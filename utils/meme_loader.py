@@ -5,39 +5,29 @@ Stage 7: Loads meme library from folders, ensures correct structure,
 and provides random meme selection by category.
 """
 
-import os
 import random
 from typing import Dict, List, Set
 
+from utils.meme_index import MemeIndex
+
 
 def load_meme_library(meme_folder: str) -> Dict[str, List[str]]:
     """
     Load all meme images/videos into a library grouped by category.
 
+    Goes through the persistent MemeIndex, so only files added or changed
+    since the last call are probed. Use MemeIndex directly for metadata
+    and attribute queries.
+
     Args:
         meme_folder: Path to the main meme folder.
 
     Returns:
         Dictionary {category_name: [list of meme file paths]}.
     """
-    meme_library: Dict[str, List[str]] = {}
-
-    if not os.path.exists(meme_folder):
-        os.makedirs(meme_folder, exist_ok=True)
-        return meme_library
-
-    for category in os.listdir(meme_folder):
-        category_path = os.path.join(meme_folder, category)
-        if os.path.isdir(category_path):
-            files = [
-                os.path.join(category_path, f)
-                for f in os.listdir(category_path)
-                if f.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".mp4"))
-            ]
-            if files:
-                meme_library[category] = files
-
-    return meme_library
+    index = MemeIndex(meme_folder)
+    index.refresh()
+    return index.library()
 
 
 def get_random_memes(
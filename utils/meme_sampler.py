@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Meme Sampler
+Weighted random meme selection with a no-repeat window and an optional
+seed. Built once from the library; each draw is O(1) thanks to alias
+tables, however large the library or however many segments need memes.
+"""
+
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Rejected draws (recently used memes) before accepting the stalest candidate.
+_MAX_REJECTIONS = 32
+
+
+class _AliasTable:
+    """Vose's alias method: O(n) to build, O(1) per weighted draw."""
+
+    def __init__(self, items: List, weights: List[float]):
+        n = len(items)
+        total = float(sum(weights))
+        self.items = items
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:  # leftovers are 1 up to rounding error
+            self.prob[i] = 1.0
+
+    def draw(self, rng: random.Random):
+        i = int(rng.random() * len(self.items))
+        return self.items[i if rng.random() < self.prob[i] else self.alias[i]]
+
+
+class MemeSampler:
+    """
+    Draws memes from selected categories.
+
+    A meme's chance is proportional to its category weight times its own
+    weight (both default to 1, which matches get_random_memes: uniform over
+    every meme in the selected categories). A meme drawn within the last
+    `no_repeat` draws is not picked again, across calls, unless the
+    selection holds too few memes for that; the window then shrinks to
+    pool size - 1.
+    """
+
+    def __init__(
+        self,
+        meme_library: Dict[str, List[str]],
+        category_weights: Optional[Dict[str, float]] = None,
+        meme_weights: Optional[Dict[str, float]] = None,
+        no_repeat: int = 16,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            meme_library: Dictionary {category: [file paths]}.
+            category_weights: Optional {category: weight}; 0 disables a category.
+            meme_weights: Optional {path: weight}; 0 excludes a meme.
+            no_repeat: Number of most recent draws that can't be repeated.
+            seed: Seed for reproducible selections.
+        """
+        if not isinstance(meme_library, dict):
+            raise ValueError("Invalid meme library: expected a dictionary of categories.")
+        category_weights = category_weights or {}
+        meme_weights = meme_weights or {}
+
+        self.no_repeat = no_repeat
+        self._rng = random.Random(seed)
+        self._tables: Dict[str, _AliasTable] = {}
+        self._category_mass: Dict[str, float] = {}
+        self._category_size: Dict[str, int] = {}
+        for category, paths in meme_library.items():
+            category_weight = category_weights.get(category, 1.0)
+            weighted = [(p, meme_weights.get(p, 1.0)) for p in paths]
+            weighted = [(p, w) for p, w in weighted if w > 0]
+            if category_weight <= 0 or not weighted:
+                continue
+            self._tables[category] = _AliasTable([p for p, _ in weighted], [w for _, w in weighted])
+            self._category_mass[category] = category_weight * sum(w for _, w in weighted)
+            self._category_size[category] = len(weighted)
+
+        self._selections: Dict[frozenset, Tuple[Optional[_AliasTable], int]] = {}
+        self._draws = 0
+        self._last_drawn: Dict[str, int] = {}
+
+    def seed(self, seed: Optional[int]):
+        """Reseed and forget the recent draws, so a selection can be replayed."""
+        self._rng.seed(seed)
+        self._draws = 0
+        self._last_drawn.clear()
+
+    def _selection(self, categories: Iterable[str]) -> Tuple[Optional[_AliasTable], int]:
+        """Alias table over the chosen categories and their total meme count (memoized)."""
+        key = frozenset(categories)
+        if key not in self._selections:
+            chosen = sorted(c for c in key if c in self._tables)
+            table = _AliasTable(chosen, [self._category_mass[c] for c in chosen]) if chosen else None
+            self._selections[key] = (table, sum(self._category_size[c] for c in chosen))
+        return self._selections[key]
+
+    def draw(self, categories: Iterable[str]) -> Optional[str]:
+        """Draw one meme from `categories`, or None if they hold no memes."""
+        table, pool_size = self._selection(categories)
+        if table is None:
+            return None
+        window = min(self.no_repeat, pool_size - 1)
+        rng = self._rng
+        best = None
+        best_age = -1
+        for _ in range(_MAX_REJECTIONS):
+            meme = self._tables[table.draw(rng)].draw(rng)
+            last = self._last_drawn.get(meme)
+            if last is None:  # never drawn: always eligible
+                best = meme
+                break
+            age = self._draws - last
+            if age >= window:
+                best = meme
+                break
+            if age > best_age:
+                best, best_age = meme, age
+        self._draws += 1
+        self._last_drawn[best] = self._draws
+        return best
+
+    def sample(self, categories: Iterable[str], count: int) -> List[str]:
+        """
+        Draw `count` memes from `categories`.
+
+        Returns:
+            List of meme file paths (empty if the categories hold no memes).
+        """
+        categories = frozenset(categories)
+        if self._selection(categories)[0] is None:
+            return []
+        return [self.draw(categories) for _ in range(count)]